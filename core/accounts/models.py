@@ -4,6 +4,8 @@ from django.contrib.auth.base_user import BaseUserManager
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db.models.functions import Upper
 from django.core.validators import RegexValidator
 from accounts.validators import validate_iranian_cellphone_number
 
@@ -66,6 +68,12 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     objects = UserManager()
 
+    class Meta:
+        indexes = [
+            # pg_trgm index on UPPER(email), the form icontains compiles to
+            GinIndex(OpClass(Upper('email'), name='gin_trgm_ops'), name='user_email_trgm_idx'),
+        ]
+
     def __str__(self):
         return self.email
 
@@ -80,6 +88,12 @@ class Profile(models.Model):
     created_date = models.DateTimeField(auto_now_add=True)
     updated_date = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            GinIndex(OpClass(Upper(field), name='gin_trgm_ops'), name=f'profile_{field}_trgm_idx')
+            for field in ('first_name', 'last_name', 'department', 'phone_number')
+        ]
+
     def get_fullname(self):
         if self.first_name or self.last_name:
             return self.first_name + " " + self.last_name
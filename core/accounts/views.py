@@ -8,6 +8,8 @@ from django.urls import reverse_lazy
 from django.contrib import messages
 from .forms import EmailAuthenticationForm, NewUserForm, EditUserForm, SelfProfileForm, StyledSetPasswordForm
 from accounts.models import Profile
+from core.pagination import KeysetPaginationMixin
+from core.search import text_q
 
 class LoginView(auth_views.LoginView):
     print("LoginView initialized with template:")
@@ -17,11 +19,12 @@ class LoginView(auth_views.LoginView):
     LOGIN_REDIRECT_URL = '/admin'
 
 
-class UserListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
+class UserListView(LoginRequiredMixin, UserPassesTestMixin, KeysetPaginationMixin, ListView):
     model = get_user_model()
     template_name = 'accounts/user_list.html'
     context_object_name = 'users'
     paginate_by = 10
+    keyset_ordering = ('-created_date', '-id')
 
     def test_func(self):
         return self.request.user.is_superuser
@@ -33,14 +36,11 @@ class UserListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
         status = self.request.GET.get('status', '').strip()  # 'enabled' | 'disabled' | ''
 
         if q:
-            from django.db.models import Q
-            qs = qs.filter(
-                Q(email__icontains=q)
-                | Q(user_profile__first_name__icontains=q)
-                | Q(user_profile__last_name__icontains=q)
-                | Q(user_profile__department__icontains=q)
-                | Q(user_profile__phone_number__icontains=q)
-            )
+            # Each column has a trigram index on UPPER(column) serving icontains
+            qs = qs.filter(text_q([
+                'email', 'user_profile__first_name', 'user_profile__last_name',
+                'user_profile__department', 'user_profile__phone_number',
+            ], q))
 
         if status == 'enabled':
             qs = qs.filter(is_active=True)
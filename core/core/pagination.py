@@ -0,0 +1,177 @@
+"""Keyset (cursor) pagination shared by the list views.
+
+Offset pagination runs a COUNT(*) and an OFFSET scan that grows with the page
+number. Keyset pagination instead remembers the ordering values of the last
+row shown and asks for the rows after it, which an index on those columns
+answers directly. It is opt-in: enabled per request with ``?cursor=`` or for
+every request with ``KEYSET_PAGINATION = True`` in settings.
+"""
+import base64
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Q
+from django.http import Http404
+
+
+def estimated_count(queryset):
+    """Row count from the PostgreSQL planner, or an exact COUNT elsewhere."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def encode_cursor(direction, values):
+    payload = json.dumps(
+        {'d': direction, 'v': values},
+        default=lambda o: o.isoformat() if hasattr(o, 'isoformat') else str(o),
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor, size):
+    """Return (direction, values) of ``cursor``; Http404 unless it holds ``size`` values."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        direction, values = payload['d'], payload['v']
+    except (ValueError, KeyError, TypeError):
+        raise Http404("Invalid cursor.")
+    if direction not in ('n', 'p') or not isinstance(values, list) or len(values) != size:
+        raise Http404("Invalid cursor.")
+    return direction, values
+
+
+def _field_name(field):
+    return field.lstrip('-')
+
+
+def _seek(ordering, values, backwards=False):
+    """Q matching the rows after ``values`` in ``ordering`` (before, if backwards)."""
+    condition = Q()
+    for i, field in enumerate(ordering):
+        descending = field.startswith('-') != backwards
+        step = Q(**{f"{_field_name(field)}__{'lt' if descending else 'gt'}": values[i]})
+        for prev_field, prev_value in zip(ordering[:i], values[:i]):
+            step &= Q(**{_field_name(prev_field): prev_value})
+        condition |= step
+    return condition
+
+
+def _reverse(ordering):
+    return [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+
+
+class KeysetPage:
+    """A page of results that knows its neighbours but not its number."""
+
+    def __init__(self, object_list, ordering, has_next, has_previous, estimated_count):
+        self.object_list = object_list
+        self.ordering = ordering
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.estimated_count = estimated_count
+        self.next_url = None
+        self.previous_url = None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def _values(self, obj):
+        return [getattr(obj, _field_name(field)) for field in self.ordering]
+
+    @property
+    def next_cursor(self):
+        if not self._has_next or not self.object_list:
+            return None
+        return encode_cursor('n', self._values(self.object_list[-1]))
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous or not self.object_list:
+            return None
+        return encode_cursor('p', self._values(self.object_list[0]))
+
+
+def keyset_paginate(queryset, ordering, page_size, cursor=None):
+    """Return the KeysetPage of ``queryset`` that follows ``cursor``."""
+    ordering = list(ordering)
+    direction, values = decode_cursor(cursor, len(ordering)) if cursor else ('n', None)
+
+    total = estimated_count(queryset)
+    backwards = direction == 'p'
+    qs = queryset.order_by(*(_reverse(ordering) if backwards else ordering))
+    try:
+        if values is not None:
+            qs = qs.filter(_seek(ordering, values, backwards=backwards))
+        rows = list(qs[:page_size + 1])
+    except (TypeError, ValueError, ValidationError):
+        # A hand-edited cursor with values of the wrong type for their columns
+        raise Http404("Invalid cursor.")
+    more = len(rows) > page_size
+    rows = rows[:page_size]
+    if backwards:
+        rows.reverse()
+        return KeysetPage(rows, ordering, has_next=True, has_previous=more, estimated_count=total)
+    return KeysetPage(rows, ordering, has_next=more, has_previous=values is not None, estimated_count=total)
+
+
+class KeysetPaginationMixin:
+    """ListView mixin adding opt-in cursor pagination ordered on ``keyset_ordering``.
+
+    The ordering must end with a unique column (usually ``id``) so every row
+    has a distinct position. In cursor mode ``page_obj`` is a KeysetPage and
+    ``cursor_page`` is set for the templates; otherwise the view paginates by
+    offset as usual and ``page_range`` holds an elided list of page numbers.
+    """
+    keyset_ordering = ('-id',)
+    cursor_param = 'cursor'
+
+    def use_keyset(self):
+        return self.cursor_param in self.request.GET or getattr(settings, 'KEYSET_PAGINATION', False)
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.use_keyset():
+            return super().paginate_queryset(queryset, page_size)
+        page = keyset_paginate(
+            queryset, self.keyset_ordering, page_size, self.request.GET.get(self.cursor_param) or None,
+        )
+        return (None, page, page.object_list, False)
+
+    def _cursor_url(self, cursor):
+        params = self.request.GET.copy()
+        params.pop('page', None)
+        params[self.cursor_param] = cursor
+        return f'?{params.urlencode()}'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        page = context.get('page_obj')
+        if isinstance(page, KeysetPage):
+            if page.next_cursor:
+                page.next_url = self._cursor_url(page.next_cursor)
+            if page.previous_cursor:
+                page.previous_url = self._cursor_url(page.previous_cursor)
+            context['cursor_page'] = page
+        elif page is not None:
+            context['page_range'] = list(context['paginator'].get_elided_page_range(
+                page.number, on_each_side=2, on_ends=1,
+            ))
+        return context
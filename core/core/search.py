@@ -0,0 +1,73 @@
+"""Search helpers shared by the list views and the global search endpoint.
+
+On PostgreSQL the searched text columns carry pg_trgm GIN indexes on
+``UPPER(column)``, the expression ``icontains`` compiles to, so substring
+filters use an index despite the leading wildcard. The free-text fields of
+requests and VLANs are mirrored into indexed ``tsvector`` columns that
+PostgreSQL generates on every write, and ranked with SearchRank. Numeric ids and IP literals
+take exact, index-backed lookups instead of pattern matching. Other
+databases fall back to plain ``icontains`` with a constant rank.
+"""
+import ipaddress
+from functools import reduce
+from operator import or_
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity
+from django.db import connections
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import Greatest
+
+
+def is_postgres(queryset):
+    return connections[queryset.db].vendor == 'postgresql'
+
+
+class ParsedQuery:
+    """A search string and the exact forms it may stand for."""
+
+    def __init__(self, raw):
+        self.text = (raw or '').strip()
+        digits = self.text.lstrip('#')
+        # isdecimal, not isdigit: int() rejects digits such as '²'
+        self.number = int(digits) if digits.isdecimal() else None
+        try:
+            self.ip = int(ipaddress.IPv4Address(self.text))
+        except ipaddress.AddressValueError:
+            self.ip = None
+
+    def __bool__(self):
+        return bool(self.text)
+
+
+def text_q(fields, text):
+    """OR of ``icontains`` over ``fields``; trigram indexes answer it on PostgreSQL."""
+    return reduce(or_, (Q(**{f'{field}__icontains': text}) for field in fields))
+
+
+def search_document(*weighted_fields):
+    """SearchVector over (field, weight) pairs, the expression of the generated ``search_vector`` columns."""
+    return reduce(
+        lambda a, b: a + b,
+        (SearchVector(field, weight=weight, config='simple') for field, weight in weighted_fields),
+    )
+
+
+def ranked_search(queryset, fields, text, vector_field=None):
+    """Filter ``queryset`` to rows matching ``text`` and annotate ``rank`` (higher is better).
+
+    Rows match when ``text`` is a substring of any of ``fields`` or, with
+    ``vector_field`` on PostgreSQL, a full-text match; every branch of the
+    filter has an index. The matches are ranked by their best trigram word
+    similarity plus the full-text rank.
+    """
+    condition = text_q(fields, text)
+    if not is_postgres(queryset):
+        return queryset.filter(condition).annotate(rank=Value(0.0, output_field=FloatField()))
+
+    similarities = [TrigramWordSimilarity(text, field) for field in fields]
+    rank = Greatest(*similarities) if len(similarities) > 1 else similarities[0]
+    if vector_field:
+        search_query = SearchQuery(text, search_type='websearch', config='simple')
+        condition |= Q(**{vector_field: search_query})
+        rank = rank + SearchRank(F(vector_field), search_query)
+    return queryset.filter(condition).annotate(rank=rank).order_by('-rank')
@@ -38,6 +38,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'dashboard',
     'accounts',
     'ipm',
@@ -103,6 +104,34 @@ DATABASES = {
     }
 }
 
+# Cache
+# Local-memory by default; set DJANGO_REDIS_URL (e.g. redis://redis:6379/1) to share
+# the cache between workers so invalidation reaches every process.
+if os.environ.get('DJANGO_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['DJANGO_REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'ipadmin',
+        }
+    }
+
+# Seconds dashboard metrics stay cached; signals invalidate them earlier on changes
+DASHBOARD_CACHE_TTL = int(os.environ.get('DASHBOARD_CACHE_TTL', 300))
+
+# Seconds the navbar pending-request count stays cached
+PENDING_COUNT_CACHE_TTL = int(os.environ.get('PENDING_COUNT_CACHE_TTL', 30))
+
+# Use cursor (keyset) pagination on the list pages instead of page numbers.
+# Individual requests can opt in with ?cursor= regardless of this setting.
+KEYSET_PAGINATION = os.environ.get('KEYSET_PAGINATION', 'false').lower() in ('1','true','yes')
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
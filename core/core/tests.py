@@ -0,0 +1,106 @@
+import base64
+import json
+from unittest import skipUnless
+
+from django.db import connection
+from django.http import Http404
+from django.test import TestCase
+from django.urls import reverse
+
+from accounts.models import User
+from ipm.models import VlanModel
+from requestflow.models import IPRequest
+from .pagination import encode_cursor, keyset_paginate
+from .search import ParsedQuery, ranked_search
+
+
+def raw_cursor(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+class KeysetPaginationTests(TestCase):
+    ordering = ('-created_at', '-id')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(email='admin@example.com', password='pw')
+        vlan = VlanModel.objects.create(name='VLAN 10', vlan_id=10, status=True)
+        IPRequest.objects.bulk_create([
+            IPRequest(user=cls.admin, vlan=vlan, ip_count=1, reason=f'r{i}', duration_days=30)
+            for i in range(7)
+        ])
+        cls.expected = list(IPRequest.objects.order_by(*cls.ordering).values_list('pk', flat=True))
+
+    def page(self, cursor=None):
+        return keyset_paginate(IPRequest.objects.all(), self.ordering, 3, cursor)
+
+    def test_walks_forward_and_back(self):
+        pages = [self.page()]
+        while pages[-1].has_next():
+            pages.append(self.page(pages[-1].next_cursor))
+        self.assertEqual([[row.pk for row in page] for page in pages], [
+            self.expected[0:3], self.expected[3:6], self.expected[6:],
+        ])
+        self.assertFalse(pages[0].has_previous())
+
+        back = self.page(pages[-1].previous_cursor)
+        self.assertEqual([row.pk for row in back], self.expected[3:6])
+        back = self.page(back.previous_cursor)
+        self.assertEqual([row.pk for row in back], self.expected[0:3])
+        self.assertFalse(back.has_previous())
+
+    def test_tampered_cursors_are_404(self):
+        cursors = [
+            'not base64!',
+            raw_cursor(['n', [1, 2]]),
+            raw_cursor({'d': 'x', 'v': ['2024-01-01T00:00:00+00:00', 1]}),
+            raw_cursor({'d': 'n', 'v': 5}),
+            raw_cursor({'d': 'n', 'v': [1]}),
+            raw_cursor({'d': 'n', 'v': ['x', 1]}),
+            raw_cursor({'d': 'p', 'v': ['2024-01-01T00:00:00+00:00', 'y']}),
+            encode_cursor('n', [None, [1]]),
+        ]
+        for cursor in cursors:
+            with self.subTest(cursor=cursor), self.assertRaises(Http404):
+                self.page(cursor)
+
+    def test_tampered_cursor_in_a_list_view_is_404(self):
+        self.client.force_login(self.admin)
+        cursor = raw_cursor({'d': 'n', 'v': ['x', 1]})
+        response = self.client.get(reverse('requestflow:admin_requests'), {'cursor': cursor})
+        self.assertEqual(response.status_code, 404)
+
+
+class ParsedQueryTests(TestCase):
+    def test_exact_forms(self):
+        self.assertEqual(ParsedQuery('#42').number, 42)
+        self.assertIsNone(ParsedQuery('²').number)
+        self.assertEqual(ParsedQuery(' 10.0.0.5 ').ip, 167772165)
+        self.assertIsNone(ParsedQuery('10.0.0').ip)
+        self.assertFalse(ParsedQuery('   '))
+
+
+@skipUnless(connection.vendor == 'postgresql', "trigram and full-text ranking are PostgreSQL specific")
+class RankedSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.office = VlanModel.objects.create(name='Office', vlan_id=10, vpn_name='corp', status=True)
+        cls.backoffice = VlanModel.objects.create(name='Backoffice printers', vlan_id=11, status=True)
+        cls.lab = VlanModel.objects.create(
+            name='Lab', vlan_id=12, status=True, description='Datacenter test racks',
+        )
+
+    def search(self, text):
+        return list(ranked_search(VlanModel.objects.all(), ['name', 'vpn_name'], text, 'search_vector'))
+
+    def test_substring_matches_ranked_by_similarity(self):
+        results = self.search('office')
+        self.assertEqual(results, [self.office, self.backoffice])
+        self.assertGreater(results[0].rank, results[1].rank)
+
+    def test_full_text_matches_unindexed_substring_fields(self):
+        self.assertEqual(self.search('datacenter'), [self.lab])
+
+    def test_generated_vector_follows_updates(self):
+        VlanModel.objects.filter(pk=self.office.pk).update(description='datacenter uplinks')
+        self.assertEqual({vlan.pk for vlan in self.search('datacenter')}, {self.office.pk, self.lab.pk})
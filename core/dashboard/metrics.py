@@ -0,0 +1,94 @@
+"""Dashboard figures computed with a small, fixed number of aggregate queries.
+
+Results are cached for ``DASHBOARD_CACHE_TTL`` seconds. Every cache key embeds
+a generation number; ``invalidate_metrics()`` bumps it, which drops the global,
+account and per-user entries at once (see requestflow.signals).
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+
+from ipm.models import IPPoolModel, VlanModel
+from requestflow.models import AssignedIP, IPRequest
+
+
+CACHE_PREFIX = 'dashboard:metrics'
+GENERATION_KEY = f'{CACHE_PREFIX}:generation'
+
+
+def _cache_key(name):
+    generation = cache.get_or_set(GENERATION_KEY, 1, None)
+    return f'{CACHE_PREFIX}:{generation}:{name}'
+
+
+def _cached(name, compute):
+    return cache.get_or_set(_cache_key(name), compute, settings.DASHBOARD_CACHE_TTL)
+
+
+def invalidate_metrics():
+    """Drop every cached dashboard figure."""
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 1, None)
+
+
+def _request_counts(qs):
+    return qs.aggregate(
+        total_requests=Count('id'),
+        pending_count=Count('id', filter=Q(status='pending')),
+        approved_count=Count('id', filter=Q(status='approved')),
+        requested_ips=Sum('ip_count'),
+    )
+
+
+def user_counts():
+    """Account totals, shown on every dashboard."""
+    User = get_user_model()
+    return User.objects.aggregate(
+        total_users=Count('id'),
+        admin_count=Count('id', filter=Q(is_staff=True)),
+        normal_user_count=Count('id', filter=Q(is_staff=False)),
+    )
+
+
+def global_metrics():
+    """Figures for the superuser dashboard: inventory and all requests."""
+    metrics = {
+        'vlan_count': VlanModel.objects.count(),
+        'pool_count': IPPoolModel.objects.count(),
+        'capacity': IPPoolModel.objects.total_capacity(),
+        'assigned_ips_total': AssignedIP.objects.count(),
+    }
+    metrics.update(_request_counts(IPRequest.objects.all()))
+    return metrics
+
+
+def user_metrics(user):
+    """Request and assignment figures for a single user."""
+    metrics = _request_counts(IPRequest.objects.filter(user=user))
+    metrics['assigned_ips_total'] = AssignedIP.objects.filter(user=user).count()
+    return metrics
+
+
+def dashboard_metrics(user):
+    """Return the dashboard context for ``user``.
+
+    Superusers see totals over all pools and requests; other users see their
+    own requests, with "total IPs" meaning the number of IPs they requested.
+    The global figures are only computed for superusers.
+    """
+    metrics = dict(_cached('users', user_counts))
+    if user.is_superuser:
+        metrics.update(_cached('global', global_metrics))
+        total_ips = metrics['capacity']
+    else:
+        metrics.update(_cached(f'user:{user.pk}', lambda: user_metrics(user)))
+        total_ips = metrics['requested_ips'] or 0
+
+    overall_usage_pct = 0
+    if total_ips:
+        overall_usage_pct = round(metrics['assigned_ips_total'] * 100 / total_ips, 2)
+    metrics.update(total_ips=total_ips, overall_usage_pct=overall_usage_pct)
+    return metrics
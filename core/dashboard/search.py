@@ -0,0 +1,101 @@
+"""Global search across requests, VLANs, IP pools and users.
+
+Numeric ids and IP literals are looked up exactly first (primary key,
+VLAN number, assigned ``ip_int`` and pool bounds, all indexed); only when
+nothing matches exactly are the text fields searched with
+core.search.ranked_search. Results from every model are merged and sorted
+by score. Regular users only see their own requests.
+"""
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from core.search import ParsedQuery, ranked_search
+from ipm.models import IPPoolModel, VlanModel
+from requestflow.models import IPRequest
+
+
+# Results per model
+SEARCH_LIMIT = 10
+
+# Score of exact id/IP matches, above any text rank
+EXACT_SCORE = 10.0
+
+
+def _result(kind, label, detail, url, score):
+    return {'type': kind, 'label': label, 'detail': detail, 'url': url, 'score': round(float(score or 0), 4)}
+
+
+def _request_results(user, rows, score=None):
+    view = 'requestflow:admin_review' if user.is_superuser else 'requestflow:request_detail'
+    return [
+        _result(
+            'request', f"Request #{r.pk}", f"{r.user.email} · {r.vlan.name} · {r.get_status_display().strip()}",
+            reverse(view, args=[r.pk]), score if score is not None else r.rank,
+        )
+        for r in rows
+    ]
+
+
+def _vlan_results(rows, score=None):
+    return [
+        _result('vlan', str(v), v.vpn_name, reverse('ipm:edit_vlan', args=[v.pk]),
+                score if score is not None else v.rank)
+        for v in rows
+    ]
+
+
+def _user_results(rows, score=None):
+    return [
+        _result('user', u.email, u.user_profile.get_fullname() if hasattr(u, 'user_profile') else '',
+                reverse('accounts:user_edit', args=[u.pk]), score if score is not None else u.rank)
+        for u in rows
+    ]
+
+
+def global_search(user, raw_query, limit=SEARCH_LIMIT):
+    """Return ranked result dicts (type, label, detail, url, score) for ``raw_query``."""
+    query = ParsedQuery(raw_query)
+    if not query:
+        return []
+
+    requests = IPRequest.objects.select_related('user', 'vlan')
+    if not user.is_superuser:
+        requests = requests.filter(user=user)
+    staff = user.is_superuser
+
+    results = []
+    if query.ip is not None:
+        results += _request_results(
+            user, requests.filter(assigned_ips__ip_int=query.ip).distinct()[:limit], EXACT_SCORE,
+        )
+        if staff:
+            pools = IPPoolModel.objects.select_related('vlan').filter(
+                ip_range_start_int__lte=query.ip, ip_range_end_int__gte=query.ip,
+            )[:limit]
+            results += [
+                _result('pool', str(p), f"{p.vlan.name} (VLAN {p.vlan.vlan_id})",
+                        reverse('ipm:detail_of_pool', args=[p.pk]), EXACT_SCORE)
+                for p in pools
+            ]
+    elif query.number is not None:
+        results += _request_results(user, requests.filter(pk=query.number), EXACT_SCORE)
+        if staff:
+            results += _vlan_results(VlanModel.objects.filter(vlan_id=query.number), EXACT_SCORE)
+    if results:
+        return results
+
+    results += _request_results(
+        user, ranked_search(requests, ['reason', 'vlan__name'], query.text, 'search_vector')[:limit],
+    )
+    if staff:
+        results += _vlan_results(
+            ranked_search(VlanModel.objects.all(), ['name', 'vpn_name'], query.text, 'search_vector')[:limit],
+        )
+        users = ranked_search(
+            get_user_model().objects.select_related('user_profile'),
+            ['email', 'user_profile__first_name', 'user_profile__last_name', 'user_profile__department'],
+            query.text,
+        )
+        results += _user_results(users[:limit])
+    results.sort(key=lambda r: r['score'], reverse=True)
+    return results
@@ -1,3 +1,73 @@
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from accounts.models import User
+from ipm.models import IPPoolModel, VlanModel
+from requestflow.models import IPRequest
+from requestflow.services import assign_addresses
+from .metrics import dashboard_metrics
+from .search import EXACT_SCORE, global_search
+
+
+class DashboardMetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(email='admin@example.com', password='pw')
+        self.user = User.objects.create_user(email='user@example.com', password='pw')
+
+    def test_global_figures_only_for_superusers(self):
+        metrics = dashboard_metrics(self.user)
+        self.assertNotIn('capacity', metrics)
+        self.assertEqual((metrics['total_users'], metrics['total_requests']), (2, 0))
+        self.assertIn('capacity', dashboard_metrics(self.admin))
+
+
+class GlobalSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(email='admin@example.com', password='pw')
+        cls.user = User.objects.create_user(email='user@example.com', password='pw')
+        cls.other = User.objects.create_user(email='other@example.com', password='pw')
+        cls.vlan = VlanModel.objects.create(name='Office', vlan_id=42, status=True)
+        cls.pool = IPPoolModel.objects.create(
+            vlan=cls.vlan, ip_range_start='10.0.0.1', ip_range_end='10.0.0.100',
+            subnet_mask='255.255.255.0', gateway='10.0.0.1',
+        )
+        cls.ip_request = IPRequest.objects.create(
+            user=cls.user, vlan=cls.vlan, ip_count=1, reason='printer uplink', duration_days=30, status='approved',
+        )
+        assign_addresses(cls.ip_request, cls.pool, [cls.pool.ip_range_start_int + 4])
+        cls.foreign = IPRequest.objects.create(
+            user=cls.other, vlan=cls.vlan, ip_count=1, reason='other', duration_days=30,
+        )
+
+    def kinds(self, results):
+        return [(result['type'], result['label']) for result in results]
+
+    def test_request_number_is_an_exact_match(self):
+        results = global_search(self.admin, f'#{self.ip_request.pk}')
+        self.assertIn(('request', f'Request #{self.ip_request.pk}'), self.kinds(results))
+        self.assertTrue(all(result['score'] == EXACT_SCORE for result in results))
+
+    def test_vlan_number_is_an_exact_match_for_staff(self):
+        self.assertIn(('vlan', str(self.vlan)), self.kinds(global_search(self.admin, '42')))
+        self.assertNotIn(('vlan', str(self.vlan)), self.kinds(global_search(self.user, '42')))
+
+    def test_users_only_find_their_own_requests(self):
+        self.assertNotIn(
+            ('request', f'Request #{self.foreign.pk}'), self.kinds(global_search(self.user, str(self.foreign.pk))),
+        )
+
+    def test_ip_finds_holder_and_pool(self):
+        results = self.kinds(global_search(self.admin, '10.0.0.5'))
+        self.assertIn(('request', f'Request #{self.ip_request.pk}'), results)
+        self.assertIn(('pool', str(self.pool)), results)
+
+    def test_text_falls_back_to_ranked_search(self):
+        self.assertIn(('request', f'Request #{self.ip_request.pk}'), self.kinds(global_search(self.user, 'printer')))
+
+    def test_my_requests_number_query(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('requestflow:my_requests'), {'q': str(self.ip_request.pk)})
+        self.assertEqual([r.pk for r in response.context['requests']], [self.ip_request.pk])
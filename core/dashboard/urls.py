@@ -5,6 +5,7 @@ app_name = "dashboard"
 
 urlpatterns = [
     path('', views.IndexView.as_view(), name='index'),
+    path('search/', views.SearchView.as_view(), name='search'),
     #path('',include('django.contrib.auth.urls'))
     #path('login/',views.LoginView.as_view(),name="login"),
    # path('logout/',views.LogoutView.as_view(),name="logout"),
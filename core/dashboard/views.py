@@ -1,11 +1,11 @@
+from django.http import JsonResponse
 from django.shortcuts import render
 from django.views.generic import TemplateView
-from django.db import models
 from django.contrib.auth.mixins import LoginRequiredMixin
-from ipm.models import VlanModel, IPPoolModel
+from ipm.models import IPPoolModel
 from requestflow.models import IPRequest
-from django.contrib.auth import get_user_model
-from requestflow.models import AssignedIP
+from .metrics import dashboard_metrics
+from .search import global_search
 
 # Create your views here.
 class IndexView(LoginRequiredMixin, TemplateView):
@@ -14,51 +14,27 @@ class IndexView(LoginRequiredMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # Dashboard metrics
-        vlan_count = VlanModel.objects.count()
-        pool_count = IPPoolModel.objects.count()
-        # Total IPs meaning differs for non-superusers
-        if self.request.user.is_superuser:
-            total_ips = sum(p.total_ip_count for p in IPPoolModel.objects.all())
-            assigned_ips_total = AssignedIP.objects.count()
-        else:
-            # For non-superusers, base totals on their requested IP counts
-            total_ips = IPRequest.objects.filter(user=self.request.user).aggregate(
-                total=models.Sum('ip_count')
-            )['total'] or 0
-            assigned_ips_total = AssignedIP.objects.filter(user=self.request.user).count()
-        overall_usage_pct = 0
-        if total_ips:
-            overall_usage_pct = round(assigned_ips_total * 100 / total_ips, 2)
-        User = get_user_model()
-        total_users = User.objects.count()
-        admin_count = User.objects.filter(is_staff=True).count()
-        normal_user_count = User.objects.filter(is_staff=False).count()
+        context.update(dashboard_metrics(self.request.user))
 
         # Requests visibility
-        if self.request.user.is_superuser:
-            total_requests = IPRequest.objects.count()
-            pending_count = IPRequest.objects.filter(status='pending').count()
-            approved_count = IPRequest.objects.filter(status='approved').count()
-            latest_requests = IPRequest.objects.select_related('user', 'vlan').order_by('-created_at')[:10]
-        else:
-            total_requests = IPRequest.objects.filter(user=self.request.user).count()
-            pending_count = IPRequest.objects.filter(user=self.request.user, status='pending').count()
-            approved_count = IPRequest.objects.filter(user=self.request.user, status='approved').count()
-            latest_requests = IPRequest.objects.select_related('user', 'vlan').filter(user=self.request.user).order_by('-created_at')[:10]
+        latest_requests = IPRequest.objects.select_related('user', 'vlan').order_by('-created_at')
+        if not self.request.user.is_superuser:
+            latest_requests = latest_requests.filter(user=self.request.user)
 
         context.update(
-            vlan_count=vlan_count,
-            pool_count=pool_count,
-            total_ips=total_ips,
-            assigned_ips_total=assigned_ips_total,
-            overall_usage_pct=overall_usage_pct,
-            total_requests=total_requests,
-            pending_count=pending_count,
-            approved_count=approved_count,
-            total_users=total_users,
-            admin_count=admin_count,
-            normal_user_count=normal_user_count,
-            ip_pools=IPPoolModel.objects.select_related('vlan').all(),
-            latest_requests=latest_requests,
+            ip_pools=IPPoolModel.objects.select_related('vlan').with_usage().order_by('ip_range_start'),
+            latest_requests=latest_requests[:10],
         )
         return context
+
+
+class SearchView(LoginRequiredMixin, TemplateView):
+    """Global search page; ``?format=json`` returns the same results as JSON."""
+    template_name = 'dashboard/search.html'
+
+    def get(self, request, *args, **kwargs):
+        query = request.GET.get('q', '').strip()
+        results = global_search(request.user, query)
+        if request.GET.get('format') == 'json':
+            return JsonResponse({'q': query, 'results': results})
+        return self.render_to_response(self.get_context_data(q=query, results=results))
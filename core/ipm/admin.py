@@ -1,9 +1,19 @@
 
 
 # Register your models here.
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+from .importer import PoolImportError, detect_format, import_pools, parse
 from .models import VlanModel, IPPoolModel
 
+
+class PoolImportForm(forms.Form):
+    file = forms.FileField(help_text="CSV or YAML file of VLANs and pools.")
+    dry_run = forms.BooleanField(required=False, label="Only validate")
+
 @admin.register(VlanModel)
 class VlanModelAdmin(admin.ModelAdmin):
     list_display = (
@@ -35,4 +45,49 @@ class IPPoolModelAdmin(admin.ModelAdmin):
     list_filter = ('is_active', 'vlan')
     search_fields = ('ip_range_start', 'ip_range_end', 'gateway', 'dns_servers', 'description')
     ordering = ('ip_range_start',)
-    readonly_fields = ('created_at', 'updated_at')
\ No newline at end of file
+    readonly_fields = ('created_at', 'updated_at')
+    change_list_template = 'admin/ipm/ippoolmodel/change_list.html'
+
+    def get_urls(self):
+        urls = [
+            path('import/', self.admin_site.admin_view(self.import_view), name='ipm_ippoolmodel_import'),
+        ]
+        return urls + super().get_urls()
+
+    def has_import_permission(self, request):
+        # Imports create VLANs as well as pools
+        return self.has_add_permission(request) and request.user.has_perm('ipm.add_vlanmodel')
+
+    def changelist_view(self, request, extra_context=None):
+        extra_context = {**(extra_context or {}), 'can_import': self.has_import_permission(request)}
+        return super().changelist_view(request, extra_context=extra_context)
+
+    def import_view(self, request):
+        """Upload a CSV/YAML file and create its VLANs and pools in one transaction."""
+        if not self.has_import_permission(request):
+            return redirect('admin:ipm_ippoolmodel_changelist')
+
+        errors = []
+        form = PoolImportForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            upload = form.cleaned_data['file']
+            dry_run = form.cleaned_data['dry_run']
+            try:
+                vlans, pools = import_pools(parse(upload, detect_format(upload.name)), dry_run=dry_run)
+            except PoolImportError as e:
+                errors = e.errors
+            else:
+                if dry_run:
+                    messages.info(request, f"File is valid: {pools} pool(s) and {vlans} new VLAN(s).")
+                else:
+                    messages.success(request, f"Imported {pools} pool(s) and {vlans} new VLAN(s).")
+                    return redirect('admin:ipm_ippoolmodel_changelist')
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': "Import IP pools",
+            'form': form,
+            'errors': errors,
+        }
+        return TemplateResponse(request, 'admin/ipm/ippoolmodel/import.html', context)
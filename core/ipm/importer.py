@@ -0,0 +1,271 @@
+"""Bulk import of VLANs and IP pools from CSV or YAML.
+
+Every record is validated in memory first: address formats, range sizes,
+gateways, and overlaps against the other pools in the file and against the
+pools already stored for the same VLAN (read with one query). If anything
+is wrong, nothing is written and every problem is reported together.
+Otherwise the new VLANs, pools and their occupancy bitmaps are inserted with
+``bulk_create`` inside a single transaction.
+
+CSV files have one pool per row with the columns ``vlan_id``, ``vlan_name``,
+``category``, ``vpn_name``, ``ip_range_start``, ``ip_range_end``,
+``subnet_mask``, ``gateway``, ``dns_servers``, ``description`` and
+``is_active``; only ``vlan_id`` and the four addresses are required, and
+``vlan_name`` is needed when the VLAN does not exist yet. YAML files hold a
+``vlans`` list whose entries carry the VLAN fields (``vlan_id``, ``name``,
+...) and a ``pools`` list using the pool column names. YAML support needs
+PyYAML.
+"""
+import csv
+import io
+import ipaddress
+from collections import defaultdict
+
+from django.db import transaction
+
+from dashboard.metrics import invalidate_metrics
+from .models import CATEGORY_CHOICES, IPPoolModel, PoolOccupancy, VlanModel
+
+try:
+    import yaml
+except ImportError:  # in requirements.txt, but only YAML imports need it
+    yaml = None
+
+
+FORMAT_CSV = 'csv'
+FORMAT_YAML = 'yaml'
+
+# Rows per INSERT statement
+IMPORT_BATCH_SIZE = 500
+
+VLAN_ID_RANGE = (1, 2048)
+
+_TRUE = {'1', 'true', 'yes', 'y', 'on'}
+
+EXISTING = 'an existing pool'
+
+
+class PoolImportError(ValueError):
+    """Raised with every validation problem found in an import file."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__(f"{len(errors)} error(s) in the import file.")
+
+
+def detect_format(filename):
+    return FORMAT_YAML if filename.lower().endswith(('.yaml', '.yml')) else FORMAT_CSV
+
+
+def _text(stream):
+    data = stream.read()
+    if not isinstance(data, bytes):
+        return data
+    try:
+        return data.decode('utf-8-sig')
+    except UnicodeDecodeError as e:
+        raise PoolImportError([f"byte {e.start}: the file is not UTF-8 text."])
+
+
+def parse_csv(stream):
+    """Return (location, record) pairs, one per CSV row."""
+    reader = csv.DictReader(io.StringIO(_text(stream)))
+    return [
+        (f"line {reader.line_num}", {key.strip(): (value or '').strip() for key, value in row.items() if key})
+        for row in reader
+    ]
+
+
+def parse_yaml(stream):
+    """Return (location, record) pairs, one per pool of every VLAN."""
+    if yaml is None:
+        raise PoolImportError(["YAML import requires PyYAML (pip install PyYAML)."])
+    try:
+        document = yaml.safe_load(_text(stream)) or {}
+    except yaml.YAMLError as e:
+        raise PoolImportError([f"Invalid YAML: {e}"])
+
+    if not isinstance(document, dict) or not isinstance(document.get('vlans') or [], list):
+        raise PoolImportError(["The YAML document must be a mapping with a 'vlans' list."])
+
+    records, errors = [], []
+    for i, vlan in enumerate(document.get('vlans') or [], start=1):
+        if not isinstance(vlan, dict):
+            errors.append(f"vlans[{i}]: expected a mapping of VLAN fields.")
+            continue
+        pools = vlan.get('pools') or []
+        if not isinstance(pools, list):
+            errors.append(f"vlans[{i}].pools: expected a list of pools.")
+            continue
+        vlan_fields = {
+            'vlan_id': vlan.get('vlan_id'),
+            'vlan_name': vlan.get('name', ''),
+            'category': vlan.get('category', ''),
+            'vpn_name': vlan.get('vpn_name', ''),
+        }
+        for j, pool in enumerate(pools, start=1):
+            if not isinstance(pool, dict):
+                errors.append(f"vlans[{i}].pools[{j}]: expected a mapping of pool fields.")
+                continue
+            records.append((f"vlans[{i}].pools[{j}]", {**vlan_fields, **pool}))
+    if errors:
+        raise PoolImportError(errors)
+    return records
+
+
+def parse(stream, fmt):
+    return parse_yaml(stream) if fmt == FORMAT_YAML else parse_csv(stream)
+
+
+def _ip(record, field, errors, location):
+    value = str(record.get(field) or '').strip()
+    try:
+        return int(ipaddress.IPv4Address(value))
+    except ipaddress.AddressValueError:
+        errors.append(f"{location}: {field} '{value}' is not a valid IPv4 address.")
+        return None
+
+
+def _vlan_number(value):
+    """The VLAN number in ``value``, or None if it is not an integer."""
+    try:
+        return int(str(value).strip())
+    except ValueError:
+        return None
+
+
+def _flag(value, default=True):
+    if value in (None, ''):
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in _TRUE
+
+
+def import_pools(records, dry_run=False):
+    """Validate ``records`` (from parse) and create their VLANs and pools.
+
+    Returns (new VLAN count, new pool count). Raises PoolImportError listing
+    every problem; nothing is written in that case or when ``dry_run``.
+    """
+    errors = []
+    categories = dict(CATEGORY_CHOICES)
+    pools = []          # (location, vlan number, start, end, pool fields)
+    new_vlans = {}      # vlan number -> unsaved VlanModel
+    vlan_names = {}     # vlan number -> (first vlan_name in the file, its location)
+
+    # One query for the VLANs and one for their pools, whatever the file size
+    vlan_numbers = {_vlan_number(record.get('vlan_id')) for _, record in records} - {None}
+    existing_vlans = {vlan.vlan_id: vlan for vlan in VlanModel.objects.filter(vlan_id__in=vlan_numbers)}
+    ranges = defaultdict(list)
+    for vlan_number, start, end in IPPoolModel.objects.filter(vlan__in=existing_vlans.values()).values_list(
+        'vlan__vlan_id', 'ip_range_start_int', 'ip_range_end_int',
+    ):
+        ranges[vlan_number].append((start, end, EXISTING))
+
+    for location, record in records:
+        vlan_number = _vlan_number(record.get('vlan_id'))
+        if vlan_number is None:
+            errors.append(f"{location}: vlan_id '{record.get('vlan_id')}' is not a number.")
+            continue
+        if not VLAN_ID_RANGE[0] <= vlan_number <= VLAN_ID_RANGE[1]:
+            errors.append(f"{location}: vlan_id must be between {VLAN_ID_RANGE[0]} and {VLAN_ID_RANGE[1]}.")
+            continue
+
+        start = _ip(record, 'ip_range_start', errors, location)
+        end = _ip(record, 'ip_range_end', errors, location)
+        mask = _ip(record, 'subnet_mask', errors, location)
+        gateway = _ip(record, 'gateway', errors, location)
+        if None in (start, end, mask, gateway):
+            continue
+        if end - start + 1 <= 1:
+            errors.append(f"{location}: End IP must be greater than Start IP.")
+            continue
+        if not start <= gateway <= end:
+            errors.append(f"{location}: Gateway must be between Start and End IP.")
+            continue
+
+        name = str(record.get('vlan_name') or '')
+        if name:
+            first_name, first_location = vlan_names.setdefault(vlan_number, (name, location))
+            if name != first_name:
+                errors.append(
+                    f"{location}: vlan_name '{name}' conflicts with '{first_name}' "
+                    f"for VLAN {vlan_number} at {first_location}."
+                )
+                continue
+
+        if vlan_number not in existing_vlans and vlan_number not in new_vlans and name:
+            category = record.get('category') or 1
+            try:
+                category = int(category)
+            except (TypeError, ValueError):
+                category = None
+            if category not in categories:
+                errors.append(f"{location}: unknown category '{record.get('category')}'.")
+                continue
+            new_vlans[vlan_number] = VlanModel(
+                vlan_id=vlan_number,
+                name=name,
+                category=category,
+                vpn_name=str(record.get('vpn_name') or ''),
+                status=True,
+            )
+
+        pools.append((location, vlan_number, start, end, {
+            'ip_range_start': str(ipaddress.IPv4Address(start)),
+            'ip_range_end': str(ipaddress.IPv4Address(end)),
+            'ip_range_start_int': start,
+            'ip_range_end_int': end,
+            'subnet_mask': str(ipaddress.IPv4Address(mask)),
+            'gateway': str(ipaddress.IPv4Address(gateway)),
+            'dns_servers': str(record.get('dns_servers') or ''),
+            'description': str(record.get('description') or ''),
+            'is_active': _flag(record.get('is_active')),
+        }))
+
+    for location, vlan_number, start, end, _ in pools:
+        if vlan_number not in existing_vlans and vlan_number not in new_vlans:
+            errors.append(f"{location}: VLAN {vlan_number} does not exist; give vlan_name to create it.")
+        ranges[vlan_number].append((start, end, location))
+
+    # Sorted by start, a range overlaps something iff it starts before the
+    # furthest end seen so far in the same VLAN
+    for vlan_number, vlan_ranges in ranges.items():
+        vlan_ranges.sort()
+        furthest = None
+        for start, end, source in vlan_ranges:
+            overlaps = furthest is not None and start <= furthest[0]
+            if overlaps and not (source == EXISTING and furthest[1] == EXISTING):
+                if source == EXISTING:
+                    errors.append(f"{furthest[1]}: range overlaps an existing pool in VLAN {vlan_number}.")
+                elif furthest[1] == EXISTING:
+                    errors.append(f"{source}: range overlaps an existing pool in VLAN {vlan_number}.")
+                else:
+                    errors.append(f"{source}: range overlaps {furthest[1]} in VLAN {vlan_number}.")
+            if furthest is None or end > furthest[0]:
+                furthest = (end, source)
+
+    if errors:
+        raise PoolImportError(errors)
+
+    if dry_run:
+        return len(new_vlans), len(pools)
+
+    with transaction.atomic():
+        VlanModel.objects.bulk_create(new_vlans.values(), batch_size=IMPORT_BATCH_SIZE)
+        vlans = {**existing_vlans, **new_vlans}
+        # bulk_create skips IPPoolModel.save and post_save, so the numeric
+        # bounds are filled in above and the empty bitmaps are created here
+        created = IPPoolModel.objects.bulk_create(
+            [IPPoolModel(vlan=vlans[vlan_number], **fields) for _, vlan_number, _, _, fields in pools],
+            batch_size=IMPORT_BATCH_SIZE,
+        )
+        PoolOccupancy.objects.bulk_create(
+            [PoolOccupancy(pool=pool, size=pool.total_ip_count,
+                           bitmap=PoolOccupancy.build_bitmap(pool.total_ip_count, ()))
+             for pool in created],
+            batch_size=IMPORT_BATCH_SIZE,
+        )
+    invalidate_metrics()
+    return len(new_vlans), len(created)
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ipm.importer import FORMAT_CSV, FORMAT_YAML, PoolImportError, detect_format, import_pools, parse
+
+
+class Command(BaseCommand):
+    help = "Create VLANs and IP pools in bulk from a CSV or YAML file (see ipm.importer for the layout)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or YAML file to import.")
+        parser.add_argument('--format', choices=[FORMAT_CSV, FORMAT_YAML], help="Default: from the file extension.")
+        parser.add_argument('--dry-run', action='store_true', help="Validate the file without saving.")
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or detect_format(options['path'])
+        try:
+            with open(options['path'], 'rb') as stream:
+                records = parse(stream, fmt)
+            vlans, pools = import_pools(records, dry_run=options['dry_run'])
+        except OSError as e:
+            raise CommandError(str(e))
+        except PoolImportError as e:
+            for error in e.errors:
+                self.stderr.write(error)
+            raise CommandError(str(e))
+
+        if options['dry_run']:
+            self.stdout.write(f"File is valid: {pools} pool(s) and {vlans} new VLAN(s) (dry run, nothing saved).")
+            return
+        self.stdout.write(self.style.SUCCESS(f"Imported {pools} pool(s) and {vlans} new VLAN(s)."))
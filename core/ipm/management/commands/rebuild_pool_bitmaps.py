@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from ipm.models import IPPoolModel, PoolOccupancy
+
+
+class Command(BaseCommand):
+    help = "Rebuild the occupancy bitmap of IP pools from their assigned IPs."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pool', type=int, action='append', help="Pool id to rebuild (repeatable). Default: all pools.")
+
+    def handle(self, *args, **options):
+        pools = IPPoolModel.objects.all()
+        if options['pool']:
+            pools = pools.filter(pk__in=options['pool'])
+
+        rebuilt = 0
+        for pool in pools.iterator(chunk_size=500):
+            PoolOccupancy.rebuild(pool)
+            rebuilt += 1
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rebuilt} pool bitmap(s)."))
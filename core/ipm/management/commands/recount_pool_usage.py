@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from ipm.models import IPPoolModel
+from requestflow.models import AssignedIP
+
+
+class Command(BaseCommand):
+    help = "Recompute IPPoolModel.used_count from the assigned IPs and repair any drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Report drift without saving.")
+
+    def handle(self, *args, **options):
+        actual = dict(
+            AssignedIP.objects.filter(pool__isnull=False)
+            .values('pool')
+            .annotate(total=Count('id'))
+            .values_list('pool', 'total')
+        )
+
+        drifted = []
+        for pool in IPPoolModel.objects.only('id', 'used_count').iterator(chunk_size=2000):
+            expected = actual.get(pool.id, 0)
+            if pool.used_count != expected:
+                self.stdout.write(f"Pool #{pool.id}: stored {pool.used_count}, actual {expected}")
+                pool.used_count = expected
+                drifted.append(pool)
+
+        if options['dry_run']:
+            self.stdout.write(f"{len(drifted)} pool(s) out of sync (dry run, nothing saved).")
+            return
+
+        with transaction.atomic():
+            IPPoolModel.objects.bulk_update(drifted, ['used_count'], batch_size=1000)
+        self.stdout.write(self.style.SUCCESS(f"Repaired {len(drifted)} pool(s)."))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ipm.models import IPPoolModel, PoolOccupancy
+from requestflow.models import AssignedIP
+
+
+class Command(BaseCommand):
+    help = "Compare each pool's occupancy bitmap with its assigned IPs and report drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help="Rebuild the bitmaps that are out of sync.")
+
+    def handle(self, *args, **options):
+        drifted = []
+        for pool in IPPoolModel.objects.select_related('occupancy').iterator(chunk_size=500):
+            size = max(pool.total_ip_count, 0)
+            ips = AssignedIP.objects.filter(pool=pool, ip_int__isnull=False).values_list('ip_int', flat=True)
+            expected = PoolOccupancy.build_bitmap(
+                size, (ip - pool.ip_range_start_int for ip in ips.iterator(chunk_size=5000))
+            )
+            occupancy = getattr(pool, 'occupancy', None)
+            if occupancy is None:
+                self.stdout.write(f"Pool #{pool.id}: no bitmap")
+                drifted.append(pool)
+            elif occupancy.size != size or bytes(occupancy.bitmap) != expected:
+                self.stdout.write(f"Pool #{pool.id}: bitmap out of sync")
+                drifted.append(pool)
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS("All pool bitmaps are in sync."))
+            return
+        if not options['fix']:
+            raise CommandError(f"{len(drifted)} pool bitmap(s) out of sync; run with --fix to rebuild them.")
+
+        for pool in drifted:
+            PoolOccupancy.rebuild(pool)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {len(drifted)} pool bitmap(s)."))
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:00
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_used_count(apps, schema_editor):
+    IPPoolModel = apps.get_model('ipm', 'IPPoolModel')
+    AssignedIP = apps.get_model('requestflow', 'AssignedIP')
+    counts = (
+        AssignedIP.objects.filter(ip_request__selected_ippool__isnull=False)
+        .values('ip_request__selected_ippool')
+        .annotate(total=Count('id'))
+        .values_list('ip_request__selected_ippool', 'total')
+    )
+    for pool_id, total in counts:
+        IPPoolModel.objects.filter(pk=pool_id).update(used_count=total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ipm', '0003_alter_vlanmodel_vpn_name'),
+        ('requestflow', '0006_assignedip_vlan_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ippoolmodel',
+            name='used_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Assigned IPs'),
+        ),
+        migrations.RunPython(populate_used_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:30
+
+import ipaddress
+
+from django.db import migrations, models
+
+
+def backfill_range_ints(apps, schema_editor):
+    IPPoolModel = apps.get_model('ipm', 'IPPoolModel')
+    pools = list(IPPoolModel.objects.only('id', 'ip_range_start', 'ip_range_end'))
+    for pool in pools:
+        pool.ip_range_start_int = int(ipaddress.ip_address(pool.ip_range_start))
+        pool.ip_range_end_int = int(ipaddress.ip_address(pool.ip_range_end))
+    IPPoolModel.objects.bulk_update(pools, ['ip_range_start_int', 'ip_range_end_int'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ipm', '0004_ippoolmodel_used_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ippoolmodel',
+            name='ip_range_start_int',
+            field=models.BigIntegerField(blank=True, editable=False, null=True, verbose_name='Start IP (numeric)'),
+        ),
+        migrations.AddField(
+            model_name='ippoolmodel',
+            name='ip_range_end_int',
+            field=models.BigIntegerField(blank=True, editable=False, null=True, verbose_name='End IP (numeric)'),
+        ),
+        migrations.RunPython(backfill_range_ints, migrations.RunPython.noop),
+    ]
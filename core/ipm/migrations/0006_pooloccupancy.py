@@ -0,0 +1,48 @@
+# Generated by Django 5.2.5 on 2026-10-18 12:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_bitmaps(apps, schema_editor):
+    IPPoolModel = apps.get_model('ipm', 'IPPoolModel')
+    PoolOccupancy = apps.get_model('ipm', 'PoolOccupancy')
+    AssignedIP = apps.get_model('requestflow', 'AssignedIP')
+    rows = []
+    for pool in IPPoolModel.objects.only('id', 'ip_range_start_int', 'ip_range_end_int').iterator():
+        if pool.ip_range_start_int is None or pool.ip_range_end_int is None:
+            continue
+        size = max(pool.ip_range_end_int - pool.ip_range_start_int + 1, 0)
+        bitmap = bytearray((size + 7) // 8)
+        ips = AssignedIP.objects.filter(pool_id=pool.pk, ip_int__isnull=False).values_list('ip_int', flat=True)
+        for ip in ips.iterator(chunk_size=5000):
+            offset = ip - pool.ip_range_start_int
+            if 0 <= offset < size:
+                bitmap[offset >> 3] |= 1 << (offset & 7)
+        rows.append(PoolOccupancy(pool_id=pool.pk, bitmap=bytes(bitmap), size=size))
+    PoolOccupancy.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ipm', '0005_ippoolmodel_range_ints'),
+        ('requestflow', '0008_assignedip_pool'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PoolOccupancy',
+            fields=[
+                ('pool', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='occupancy', serialize=False, to='ipm.ippoolmodel', verbose_name='IP Pool')),
+                ('bitmap', models.BinaryField(default=bytes)),
+                ('size', models.PositiveIntegerField(default=0, verbose_name='Addresses')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Pool Occupancy',
+                'verbose_name_plural': 'Pool Occupancy',
+            },
+        ),
+        migrations.RunPython(build_bitmaps, migrations.RunPython.noop),
+    ]
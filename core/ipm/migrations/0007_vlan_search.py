@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-18 12:45
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_search_indexes'),
+        ('ipm', '0006_pooloccupancy'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vlanmodel',
+            name='search_vector',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.SearchVector('name', config='simple', weight='A'), '||', django.contrib.postgres.search.SearchVector('vpn_name', config='simple', weight='B'), django.contrib.postgres.search.SearchConfig('simple')), '||', django.contrib.postgres.search.SearchVector('description', config='simple', weight='C'), django.contrib.postgres.search.SearchConfig('simple')), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        migrations.AddIndex(
+            model_name='vlanmodel',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='vlan_search_vector_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vlanmodel',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('name'), name='gin_trgm_ops'), name='vlan_name_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vlanmodel',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('vpn_name'), name='gin_trgm_ops'), name='vlan_vpn_name_trgm_idx'),
+        ),
+    ]
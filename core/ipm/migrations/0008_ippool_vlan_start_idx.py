@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-18 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ipm', '0007_vlan_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ippoolmodel',
+            index=models.Index(fields=['vlan', 'ip_range_start_int', 'id'], name='ippool_vlan_start_idx'),
+        ),
+    ]
@@ -1,7 +1,12 @@
-from django.db import models
+from django.db import connection, models, transaction
+from django.db.models import BigIntegerField, BinaryField, Case, Count, ExpressionWrapper, F, FloatField, Func, Sum, Value, When
+from django.db.models.functions import Cast, Round, Upper
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.core.exceptions import ValidationError
-from requestflow.models import AssignedIP
+from requestflow.models import AssignedIP, ip_to_int
+from core.search import search_document
 from decimal import Decimal, ROUND_HALF_UP
 
 import ipaddress
@@ -56,10 +61,24 @@ class VlanModel(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # (field, weight) pairs indexed in search_vector
+    SEARCH_FIELDS = (('name', 'A'), ('vpn_name', 'B'), ('description', 'C'))
+
+    # Full-text document of SEARCH_FIELDS, generated by PostgreSQL on every write
+    search_vector = models.GeneratedField(
+        expression=search_document(*SEARCH_FIELDS), output_field=SearchVectorField(), db_persist=True,
+    )
+
     class Meta:
         verbose_name = "VLAN"
         verbose_name_plural = "VLANs"
         ordering = ['vlan_id']
+        indexes = [
+            GinIndex(fields=['search_vector'], name='vlan_search_vector_idx'),
+            # pg_trgm indexes on UPPER(column), the form icontains compiles to
+            GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'), name='vlan_name_trgm_idx'),
+            GinIndex(OpClass(Upper('vpn_name'), name='gin_trgm_ops'), name='vlan_vpn_name_trgm_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} (VLAN {self.vlan_id})"
@@ -67,6 +86,50 @@ class VlanModel(models.Model):
 
 
 
+def _pool_size():
+    return ExpressionWrapper(
+        F('ip_range_end_int') - F('ip_range_start_int') + 1,
+        output_field=BigIntegerField(),
+    )
+
+
+class IPPoolQuerySet(models.QuerySet):
+    def with_usage(self):
+        """Annotate ``assigned``, ``total`` and ``usage_pct`` in a single query."""
+        return self.annotate(
+            assigned=Count('assigned_ips'),
+            total=_pool_size(),
+        ).annotate(
+            usage_pct=Case(
+                When(total__gt=0, then=Round(
+                    Cast(F('assigned'), FloatField()) * 100 / Cast(F('total'), FloatField()), 2
+                )),
+                default=Value(0.0),
+                output_field=FloatField(),
+            ),
+        )
+
+
+    def total_capacity(self):
+        """Number of addresses across all pools, as one SUM in the database."""
+        return self.aggregate(total=Sum(_pool_size()))['total'] or 0
+
+    def capacity_report(self, group_by='vlan'):
+        """Pools, capacity and used addresses grouped per VLAN or per VLAN category."""
+        if group_by == 'category':
+            keys = ('vlan__category',)
+        elif group_by == 'vlan':
+            keys = ('vlan', 'vlan__name', 'vlan__vlan_id')
+        else:
+            raise ValueError(f"Unknown capacity grouping: {group_by}")
+        return (
+            self.order_by()
+            .values(*keys)
+            .annotate(pools=Count('id'), capacity=Sum(_pool_size()), used=Sum('used_count'))
+            .order_by(*keys)
+        )
+
+
 class IPPoolModel(models.Model):
     # Link to the VLAN this IP pool belongs to
     vlan = models.ForeignKey(VlanModel, on_delete=models.CASCADE, related_name='ip_pools', verbose_name="VLAN")
@@ -75,6 +138,10 @@ class IPPoolModel(models.Model):
     ip_range_start = models.GenericIPAddressField(protocol='IPv4', verbose_name="Start IP")
     ip_range_end = models.GenericIPAddressField(protocol='IPv4', verbose_name="End IP")
 
+    # Integer form of the range bounds, kept in sync on save, for SQL arithmetic
+    ip_range_start_int = models.BigIntegerField(null=True, blank=True, editable=False, verbose_name="Start IP (numeric)")
+    ip_range_end_int = models.BigIntegerField(null=True, blank=True, editable=False, verbose_name="End IP (numeric)")
+
     # Subnet mask
     subnet_mask = models.GenericIPAddressField(protocol='IPv4', verbose_name="Subnet Mask")
 
@@ -90,13 +157,22 @@ class IPPoolModel(models.Model):
     # Active status
     is_active = models.BooleanField(default=True, verbose_name="Is Active")
 
+    # Number of assigned IPs, maintained on assign/release (see recount_pool_usage)
+    used_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Assigned IPs")
+
+
+    objects = IPPoolQuerySet.as_manager()
+
+    # The properties below prefer the with_usage() annotations when present
 
     @property
     def assigned_ip_count(self):
-        return AssignedIP.objects.filter(ip_request__selected_ippool=self).count()
+        return getattr(self, 'assigned', self.used_count)
 
     @property
     def total_ip_count(self):
+        if getattr(self, 'total', None) is not None:
+            return self.total
         try:
             start_ip = ipaddress.IPv4Address(self.ip_range_start)
             end_ip = ipaddress.IPv4Address(self.ip_range_end)
@@ -106,6 +182,8 @@ class IPPoolModel(models.Model):
 
     @property
     def usage_percentage(self):
+        if getattr(self, 'usage_pct', None) is not None:
+            return Decimal(str(self.usage_pct)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
         total = self.total_ip_count
         assigned = self.assigned_ip_count
         if total == 0:
@@ -123,9 +201,21 @@ class IPPoolModel(models.Model):
         verbose_name = "IP Pool"
         verbose_name_plural = "IP Pools"
         ordering = ['ip_range_start']
+        indexes = [
+            # Pool list order (offset and keyset modes) and the per-VLAN pool scan
+            models.Index(fields=['vlan', 'ip_range_start_int', 'id'], name='ippool_vlan_start_idx'),
+        ]
 
     def __str__(self):
         return f"{self.vlan.name} Pool: {self.ip_range_start} - {self.ip_range_end}"
+
+    def save(self, *args, **kwargs):
+        self.ip_range_start_int = ip_to_int(self.ip_range_start)
+        self.ip_range_end_int = ip_to_int(self.ip_range_end)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'ip_range_start', 'ip_range_end'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'ip_range_start_int', 'ip_range_end_int'}
+        super().save(*args, **kwargs)
     
     def clean(self):
         # Convert to ipaddress.IPv4Address for comparison
@@ -141,3 +231,173 @@ class IPPoolModel(models.Model):
         if not (start_ip <= gateway_ip <= end_ip):
             raise ValidationError("Gateway IP must be within the IP range.")
 
+
+# Number of set bits in every possible byte value
+_POPCOUNT = bytes(bin(i).count('1') for i in range(256))
+
+
+def _count_set(bitmap, lo, hi):
+    """Number of set bits in [lo, hi), a byte at a time where aligned."""
+    count = 0
+    while lo < hi and lo & 7:
+        count += (bitmap[lo >> 3] >> (lo & 7)) & 1
+        lo += 1
+    while lo + 8 <= hi:
+        count += _POPCOUNT[bitmap[lo >> 3]]
+        lo += 8
+    while lo < hi:
+        count += (bitmap[lo >> 3] >> (lo & 7)) & 1
+        lo += 1
+    return count
+
+
+class SetBit(Func):
+    """PostgreSQL set_bit(bytea, n, value): bit n is bit n % 8 of byte n // 8."""
+    function = 'set_bit'
+    output_field = BinaryField()
+
+
+class PoolOccupancy(models.Model):
+    """Compact occupancy index of an IP pool: one bit per address.
+
+    Bit ``n`` (least significant first within each byte, as PostgreSQL's
+    set_bit numbers them) is set when the pool's ``n``-th address is assigned,
+    so a /16 pool fits in 8 KB. It is kept in step by the assignment service
+    and requestflow.signals; ``rebuild_pool_bitmaps`` and
+    ``verify_pool_bitmaps`` repair or check it against the AssignedIP rows.
+    """
+    pool = models.OneToOneField(
+        IPPoolModel, on_delete=models.CASCADE, primary_key=True,
+        related_name='occupancy', verbose_name="IP Pool"
+    )
+    bitmap = models.BinaryField(default=bytes)
+    size = models.PositiveIntegerField(default=0, verbose_name="Addresses")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Pool Occupancy"
+        verbose_name_plural = "Pool Occupancy"
+
+    def __str__(self):
+        return f"Occupancy of {self.pool}"
+
+    @staticmethod
+    def build_bitmap(size, offsets):
+        bitmap = bytearray((size + 7) // 8)
+        for offset in offsets:
+            if 0 <= offset < size:
+                bitmap[offset >> 3] |= 1 << (offset & 7)
+        return bytes(bitmap)
+
+    @classmethod
+    def rebuild(cls, pool):
+        """Recreate the bitmap of ``pool`` from its AssignedIP rows."""
+        start = pool.ip_range_start_int
+        size = max(pool.total_ip_count, 0)
+        offsets = (
+            ip - start
+            for ip in AssignedIP.objects.filter(pool=pool, ip_int__isnull=False)
+            .values_list('ip_int', flat=True).iterator(chunk_size=5000)
+        )
+        occupancy, _ = cls.objects.update_or_create(
+            pool=pool, defaults={'bitmap': cls.build_bitmap(size, offsets), 'size': size},
+        )
+        return occupancy
+
+    @classmethod
+    def mark(cls, pool, ips, used=True):
+        """Set (or clear) the bits of the integer addresses ``ips`` in ``pool``."""
+        start = pool.ip_range_start_int
+        offsets = [ip - start for ip in ips if ip is not None]
+        if not offsets:
+            return
+        if connection.vendor == 'postgresql' and len(offsets) == 1:
+            # Single address (signals): flip the bit in SQL without reading the
+            # blob. An address outside the range (the pool's start was moved
+            # past it) has no bit, and set_bit would reject the offset.
+            if offsets[0] < 0:
+                return
+            cls.objects.filter(pool=pool, size__gt=offsets[0]).update(
+                bitmap=SetBit(F('bitmap'), Value(offsets[0]), Value(int(used)))
+            )
+            return
+        with transaction.atomic():
+            occupancy = cls.objects.select_for_update().filter(pool=pool).first()
+            if occupancy is None:
+                return
+            bitmap = bytearray(occupancy.bitmap)
+            for offset in offsets:
+                if 0 <= offset < occupancy.size:
+                    if used:
+                        bitmap[offset >> 3] |= 1 << (offset & 7)
+                    else:
+                        bitmap[offset >> 3] &= ~(1 << (offset & 7)) & 0xFF
+            occupancy.bitmap = bytes(bitmap)
+            occupancy.save(update_fields=['bitmap', 'updated_at'])
+
+    def is_used(self, offset):
+        return bool(bytes(self.bitmap)[offset >> 3] & (1 << (offset & 7)))
+
+    @property
+    def used_count(self):
+        return sum(_POPCOUNT[byte] for byte in bytes(self.bitmap))
+
+    @property
+    def free_count(self):
+        return self.size - self.used_count
+
+    def first_free(self):
+        """Offset of the first free address, or None if the pool is full."""
+        for index, byte in enumerate(bytes(self.bitmap)):
+            if byte != 0xFF:
+                for bit in range(8):
+                    offset = (index << 3) + bit
+                    if offset < self.size and not byte & (1 << bit):
+                        return offset
+        return None
+
+    def free_runs(self):
+        """Yield (offset, length) for every run of free addresses."""
+        bitmap = bytes(self.bitmap)
+        run_start = None
+        for index, byte in enumerate(bitmap):
+            if byte == 0 and run_start is not None:
+                continue
+            if byte == 0xFF and run_start is None:
+                continue
+            for bit in range(8):
+                offset = (index << 3) + bit
+                if offset >= self.size:
+                    break
+                if byte & (1 << bit):
+                    if run_start is not None:
+                        yield run_start, offset - run_start
+                        run_start = None
+                elif run_start is None:
+                    run_start = offset
+        if run_start is not None:
+            yield run_start, self.size - run_start
+
+    def free_gaps(self, start):
+        """Free (first, last) integer address ranges, for a pool starting at ``start``.
+
+        The same shape as requestflow.services.free_gaps, read from the
+        bitmap instead of the AssignedIP rows.
+        """
+        return [(start + offset, start + offset + length - 1) for offset, length in self.free_runs()]
+
+    def largest_free_block(self):
+        return max((length for _, length in self.free_runs()), default=0)
+
+    def heatmap(self, buckets=64):
+        """Usage percentage of ``buckets`` equal slices of the pool, in address order."""
+        if not self.size:
+            return []
+        bitmap = bytes(self.bitmap)
+        buckets = min(buckets, self.size)
+        cells = []
+        for i in range(buckets):
+            lo = i * self.size // buckets
+            hi = (i + 1) * self.size // buckets
+            cells.append(round(_count_set(bitmap, lo, hi) * 100 / (hi - lo)))
+        return cells
@@ -1,8 +1,17 @@
     # templatetags/form_tags.py
 from django import template
+from requestflow.models import int_to_ip
 
 register = template.Library()
 
 @register.filter(name='add_class')
 def add_class(field, css_class):
-    return field.as_widget(attrs={"class": css_class})
\ No newline at end of file
+    return field.as_widget(attrs={"class": css_class})
+
+
+@register.filter(name='int_to_ip')
+def int_to_ip_filter(value):
+    """Render a numeric IPv4 address (e.g. an ip_int aggregate) in dotted form."""
+    if value is None or value == '':
+        return ''
+    return int_to_ip(value)
@@ -1,3 +1,209 @@
+import io
+
+from django.contrib.auth.models import Permission
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
 from django.test import TestCase
+from django.urls import reverse
+
+from accounts.models import User
+from requestflow.expiry import release_assignments
+from requestflow.models import IPRequest
+from requestflow.services import assign_addresses
+from .importer import FORMAT_CSV, FORMAT_YAML, PoolImportError, import_pools, parse
+from .models import IPPoolModel, PoolOccupancy, VlanModel
+
+
+CSV_HEADER = 'vlan_id,vlan_name,ip_range_start,ip_range_end,subnet_mask,gateway\n'
+
+
+def csv_records(*rows):
+    return parse(io.BytesIO((CSV_HEADER + ''.join(f'{row}\n' for row in rows)).encode()), FORMAT_CSV)
+
+
+def yaml_records(text):
+    return parse(io.BytesIO(text.encode()), FORMAT_YAML)
+
+
+class PoolImportTests(TestCase):
+    def assertImportErrors(self, records, *fragments):
+        with self.assertRaises(PoolImportError) as raised:
+            import_pools(records)
+        for fragment in fragments:
+            self.assertTrue(any(fragment in error for error in raised.exception.errors), raised.exception.errors)
+        return raised.exception.errors
+
+    def test_creates_vlans_pools_and_bitmaps(self):
+        records = csv_records(
+            '10,Office,10.0.0.1,10.0.0.100,255.255.255.0,10.0.0.1',
+            '10,Office,10.0.1.1,10.0.1.50,255.255.255.0,10.0.1.1',
+        )
+        self.assertEqual(import_pools(records), (1, 2))
+        vlan = VlanModel.objects.get(vlan_id=10)
+        self.assertEqual(vlan.name, 'Office')
+        self.assertEqual(IPPoolModel.objects.filter(vlan=vlan).count(), 2)
+        self.assertEqual(
+            sorted(PoolOccupancy.objects.values_list('size', flat=True)), [50, 100],
+        )
+
+    def test_dry_run_saves_nothing(self):
+        records = csv_records('10,Office,10.0.0.1,10.0.0.100,255.255.255.0,10.0.0.1')
+        self.assertEqual(import_pools(records, dry_run=True), (1, 1))
+        self.assertFalse(VlanModel.objects.exists())
+
+    def test_reports_every_error_and_saves_nothing(self):
+        records = csv_records(
+            '10,Office,10.0.0.1,10.0.0.100,255.255.255.0,10.0.0.1',
+            '10,Office,10.0.0.50,10.0.0.150,255.255.255.0,10.0.0.50',
+            '11,Lab,10.1.0.1,not-an-ip,255.255.255.0,10.1.0.1',
+            '12,,10.2.0.1,10.2.0.9,255.255.255.0,10.2.0.1',
+        )
+        self.assertImportErrors(
+            records, 'line 3: range overlaps line 2', "ip_range_end 'not-an-ip'", 'VLAN 12 does not exist',
+        )
+        self.assertFalse(VlanModel.objects.exists())
+
+    def test_non_ascii_and_huge_vlan_numbers_are_reported(self):
+        self.assertImportErrors(
+            csv_records(
+                '²,Office,10.0.0.1,10.0.0.100,255.255.255.0,10.0.0.1',
+                '99999999999999999999,Lab,10.0.1.1,10.0.1.50,255.255.255.0,10.0.1.1',
+            ),
+            "line 2: vlan_id '²' is not a number", 'line 3: vlan_id must be between',
+        )
+
+    def test_overlap_with_existing_pool(self):
+        import_pools(csv_records('10,Office,10.0.0.1,10.0.0.100,255.255.255.0,10.0.0.1'))
+        self.assertImportErrors(
+            csv_records('10,,10.0.0.90,10.0.0.120,255.255.255.0,10.0.0.90'),
+            'line 2: range overlaps an existing pool in VLAN 10',
+        )
+
+    def test_conflicting_vlan_names(self):
+        self.assertImportErrors(
+            csv_records(
+                '10,Office,10.0.0.1,10.0.0.100,255.255.255.0,10.0.0.1',
+                '10,Lab,10.0.1.1,10.0.1.50,255.255.255.0,10.0.1.1',
+            ),
+            "line 3: vlan_name 'Lab' conflicts with 'Office' for VLAN 10 at line 2",
+        )
+
+    def test_yaml(self):
+        records = yaml_records(
+            'vlans:\n'
+            '  - vlan_id: 20\n'
+            '    name: Servers\n'
+            '    pools:\n'
+            '      - {ip_range_start: 10.2.0.1, ip_range_end: 10.2.0.20, subnet_mask: 255.255.255.0, gateway: 10.2.0.1}\n'
+        )
+        self.assertEqual(import_pools(records), (1, 1))
+
+    def test_malformed_yaml_is_reported(self):
+        for text in ('- just\n- a list\n', 'vlans: 5\n', 'vlans: [5]\n', 'vlans:\n  - vlan_id: 1\n    pools: [x]\n'):
+            with self.subTest(text=text), self.assertRaises(PoolImportError):
+                yaml_records(text)
+
+    def test_non_utf8_file_is_reported(self):
+        with self.assertRaises(PoolImportError) as raised:
+            parse(io.BytesIO(CSV_HEADER.encode() + b'10,\xff\xfe,10.0.0.1\n'), FORMAT_CSV)
+        self.assertIn('not UTF-8', raised.exception.errors[0])
+
+
+class PoolImportAdminTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(email='staff@example.com', password='pw', is_staff=True)
+        self.staff.user_permissions.add(Permission.objects.get(codename='add_ippoolmodel'))
+        self.client.force_login(self.staff)
+        self.url = reverse('admin:ipm_ippoolmodel_import')
+
+    def upload(self):
+        data = CSV_HEADER + '10,Office,10.0.0.1,10.0.0.100,255.255.255.0,10.0.0.1\n'
+        return self.client.post(self.url, {'file': SimpleUploadedFile('pools.csv', data.encode())})
+
+    def test_requires_vlan_add_permission(self):
+        self.assertEqual(self.upload().status_code, 302)
+        self.assertFalse(VlanModel.objects.exists())
+
+    def test_imports_with_both_permissions(self):
+        self.staff.user_permissions.add(Permission.objects.get(codename='add_vlanmodel'))
+        self.upload()
+        self.assertEqual(IPPoolModel.objects.count(), 1)
+
+
+class PoolOccupancyTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='user@example.com', password='pw')
+        self.vlan = VlanModel.objects.create(name='VLAN 10', vlan_id=10, status=True)
+        self.pool = IPPoolModel.objects.create(
+            vlan=self.vlan, ip_range_start='10.0.0.1', ip_range_end='10.0.0.100',
+            subnet_mask='255.255.255.0', gateway='10.0.0.1',
+        )
+        self.start = self.pool.ip_range_start_int
+        self.ip_request = IPRequest.objects.create(
+            user=self.user, vlan=self.vlan, ip_count=10, reason='test', duration_days=30, status='approved',
+        )
+
+    def occupancy(self):
+        return PoolOccupancy.objects.get(pool=self.pool)
+
+    def used_offsets(self):
+        occupancy = self.occupancy()
+        return [offset for offset in range(occupancy.size) if occupancy.is_used(offset)]
+
+    def assign(self, *offsets):
+        return assign_addresses(self.ip_request, self.pool, [self.start + offset for offset in offsets])
+
+    def test_new_pool_gets_an_empty_bitmap(self):
+        occupancy = self.occupancy()
+        self.assertEqual((occupancy.size, occupancy.used_count, occupancy.largest_free_block()), (100, 0, 100))
+
+    def test_assign_and_release_keep_bits_in_step(self):
+        rows = self.assign(0, 1, 7, 8, 9)
+        self.assertEqual(self.used_offsets(), [0, 1, 7, 8, 9])
+        self.assertEqual(self.occupancy().free_gaps(self.start), [
+            (self.start + 2, self.start + 6), (self.start + 10, self.start + 99),
+        ])
+
+        rows[0].delete()
+        self.assertEqual(self.used_offsets(), [1, 7, 8, 9])
+
+        release_assignments([(row.pk, row.pool_id, row.ip_int) for row in rows[2:]])
+        self.assertEqual(self.used_offsets(), [1])
+        self.pool.refresh_from_db()
+        self.assertEqual(self.pool.used_count, 1)
+
+    def test_range_edit_rebuilds_offsets(self):
+        self.assign(10)
+        self.pool.ip_range_start = '10.0.0.6'
+        self.pool.save()
+        self.assertEqual(self.occupancy().size, 95)
+        self.assertEqual(self.used_offsets(), [5])
+
+    def test_verify_reports_and_fixes_drift(self):
+        self.assign(3)
+        call_command('verify_pool_bitmaps', stdout=io.StringIO())
+        PoolOccupancy.objects.filter(pool=self.pool).update(bitmap=PoolOccupancy.build_bitmap(100, []))
+        with self.assertRaises(CommandError):
+            call_command('verify_pool_bitmaps', stdout=io.StringIO())
+        call_command('verify_pool_bitmaps', fix=True, stdout=io.StringIO())
+        self.assertEqual(self.used_offsets(), [3])
+
 
-# Create your tests here.
+class PoolListOrderTests(TestCase):
+    def test_same_order_with_and_without_cursor(self):
+        admin = User.objects.create_superuser(email='admin@example.com', password='pw')
+        for vlan_id, starts in ((20, ('10.2.0.1', '10.1.0.1')), (10, ('10.4.0.1', '10.3.0.1'))):
+            vlan = VlanModel.objects.create(name=f'VLAN {vlan_id}', vlan_id=vlan_id, status=True)
+            for start in starts:
+                IPPoolModel.objects.create(
+                    vlan=vlan, ip_range_start=start, ip_range_end=start[:-1] + '9',
+                    subnet_mask='255.255.255.0', gateway=start,
+                )
+        self.client.force_login(admin)
+        url = reverse('ipm:ippoollist')
+        offset_order = [pool.pk for pool in self.client.get(url).context['ip_pools']]
+        keyset_order = [pool.pk for pool in self.client.get(url, {'cursor': ''}).context['ip_pools']]
+        self.assertEqual(offset_order, keyset_order)
+        self.assertEqual(offset_order, list(
+            IPPoolModel.objects.order_by('vlan_id', 'ip_range_start_int').values_list('pk', flat=True)
+        ))
@@ -17,6 +17,7 @@ urlpatterns = [
     path('ippool/<int:pk>/edit/', EditIPPoolView.as_view(), name='edit_ippool'),
     path('ippool/<int:pk>/delete/', DeleteIPPoolView.as_view(), name='delete_ippool'),
     path('ippool/<int:pk>/detail',DetailIPpoolView.as_view(),name="detail_of_pool"),
+    path('ippool/capacity/', views.capacity_report, name='capacity_report'),
 
 
 
@@ -2,11 +2,15 @@
 from django.views.generic import CreateView, ListView, DetailView, UpdateView, DeleteView
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.urls import reverse_lazy
-from .models import IPPoolModel, VlanModel
+from .models import IPPoolModel, PoolOccupancy, VlanModel, CATEGORY_CHOICES
 from .forms import IPPoolForm, VlanForm
 from django.shortcuts import get_object_or_404
-from requestflow.models import AssignedIP
+from django.http import JsonResponse, HttpResponseForbidden
+from requestflow.models import AssignedIP, int_to_ip
 from django.contrib import messages
+from django.core.paginator import Paginator
+from django.db.models import Q
+from core.pagination import KeysetPaginationMixin
 
 class NewIpPoolView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
     model = IPPoolModel
@@ -19,14 +23,19 @@ class NewIpPoolView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
 
 
 
-class IppoolListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
+class IppoolListView(LoginRequiredMixin, UserPassesTestMixin, KeysetPaginationMixin, ListView):
     model = IPPoolModel
     paginate_by = 10  # Number of IP pools per page
+    keyset_ordering = ('vlan_id', 'ip_range_start_int', 'id')
     template_name = 'ipm/list_ippool.html'  # Template for listing IP pools
     context_object_name = 'ip_pools'
     def test_func(self):
         return self.request.user.is_superuser
 
+    def get_queryset(self):
+        # The same order with or without a cursor, answered by ippool_vlan_start_idx
+        return IPPoolModel.objects.select_related('vlan').with_usage().order_by(*self.keyset_ordering)
+
 
 class EditIPPoolView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
     model = IPPoolModel
@@ -52,25 +61,129 @@ class DeleteIPPoolView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
         return super().delete(request, *args, **kwargs)
 
 
+# ?sort= values of the pool detail table; every ordering ends on a unique column
+ASSIGNED_IP_SORTS = {
+    'ip': ('ip_int', 'id'),
+    '-ip': ('-ip_int', '-id'),
+    'created': ('created_at', 'id'),
+    '-created': ('-created_at', '-id'),
+}
+
+
 class DetailIPpoolView(LoginRequiredMixin, UserPassesTestMixin, DetailView):
     model = IPPoolModel
     template_name = 'ipm/ippool_detail.html'
     context_object_name = 'pool'
+    paginate_by = 50  # Assigned IPs per page
     def test_func(self):
         return self.request.user.is_superuser
 
     def get_object(self):
         pool_id = self.kwargs.get('pk')
-        return get_object_or_404(IPPoolModel, pk=pool_id)
+        return get_object_or_404(IPPoolModel.objects.select_related('vlan').with_usage(), pk=pool_id)
+
+    def filter_assigned_ips(self):
+        """Return (queryset, is_filtered) for the assigned IP table.
+
+        Filters: ``user`` (email contains), ``request`` (request id) and
+        ``monitored`` (``1`` or ``0``); ``sort`` picks an ASSIGNED_IP_SORTS key.
+        """
+        params = self.request.GET
+        qs = AssignedIP.objects.filter(pool=self.object)
+        filtered = False
+
+        user = params.get('user', '').strip()
+        if user:
+            qs = qs.filter(user__email__icontains=user)
+            filtered = True
+        request_id = params.get('request', '').strip()
+        if request_id.isdigit():
+            qs = qs.filter(ip_request_id=int(request_id))
+            filtered = True
+        monitored = params.get('monitored')
+        if monitored in ('0', '1'):
+            qs = qs.filter(is_monitored=monitored == '1')
+            filtered = True
+
+        ordering = ASSIGNED_IP_SORTS.get(params.get('sort'), ASSIGNED_IP_SORTS['ip'])
+        return qs.select_related('user').order_by(*ordering), filtered
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['assigned_ips'] = AssignedIP.objects.filter(
-            ip_request__selected_ippool=self.object
-        )
+        pool = self.object
+
+        # with_usage() already counted the pool; read the figures once here
+        context['usage'] = {
+            'assigned': pool.assigned_ip_count,
+            'total': pool.total_ip_count,
+            'percentage': pool.usage_percentage,
+        }
+
+        assigned_ips, filtered = self.filter_assigned_ips()
+        paginator = Paginator(assigned_ips, self.paginate_by)
+        if not filtered:
+            # Unfiltered, the row count is the pool's count: skip the COUNT(*)
+            paginator.count = context['usage']['assigned']
+        page = paginator.get_page(self.request.GET.get('page'))
+        params = self.request.GET.copy()
+        params.pop('page', None)
+        sort_params = params.copy()
+        sort_params.pop('sort', None)
+        context.update({
+            'assigned_ips': page.object_list,
+            'page_obj': page,
+            'paginator': paginator,
+            'is_paginated': page.has_other_pages(),
+            'page_range': list(paginator.get_elided_page_range(page.number, on_each_side=2, on_ends=1)),
+            'filter_query': params.urlencode(),
+            'sort_query': sort_params.urlencode(),
+            'sort': self.request.GET.get('sort') if self.request.GET.get('sort') in ASSIGNED_IP_SORTS else 'ip',
+        })
+
+        occupancy = PoolOccupancy.objects.filter(pool=pool).first()
+        if occupancy is not None:
+            first_free = occupancy.first_free()
+            context['occupancy'] = occupancy
+            context['first_free'] = (
+                int_to_ip(pool.ip_range_start_int + first_free) if first_free is not None else None
+            )
+            context['largest_free_block'] = occupancy.largest_free_block()
+            # (percent used, hue from green at 0% to red at 100%)
+            context['heatmap'] = [(used, 120 - used * 6 // 5) for used in occupancy.heatmap()]
         return context
 
 
+def capacity_report(request):
+    """Return JSON with pool capacity and usage grouped per VLAN or category.
+
+    Query parameters: ``group`` (``vlan`` by default, or ``category``) and
+    ``active`` (``1`` to only count active pools).
+    """
+    if not request.user.is_authenticated or not request.user.is_superuser:
+        return HttpResponseForbidden()
+
+    group_by = request.GET.get('group', 'vlan')
+    pools = IPPoolModel.objects.all()
+    if request.GET.get('active') == '1':
+        pools = pools.filter(is_active=True)
+    try:
+        rows = list(pools.capacity_report(group_by))
+    except ValueError as e:
+        return JsonResponse({"detail": str(e)}, status=400)
+
+    categories = dict(CATEGORY_CHOICES)
+    for row in rows:
+        row['free'] = max((row['capacity'] or 0) - (row['used'] or 0), 0)
+        if 'vlan__category' in row:
+            row['category_label'] = categories.get(row['vlan__category'])
+
+    return JsonResponse({
+        "group": group_by,
+        "total_capacity": sum(row['capacity'] or 0 for row in rows),
+        "rows": rows,
+    })
+
+
 class NewVlanView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
     model = VlanModel
     form_class = VlanForm
@@ -80,9 +193,10 @@ class NewVlanView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
         return self.request.user.is_superuser
 
 
-class ListVlanView(LoginRequiredMixin, UserPassesTestMixin, ListView):
+class ListVlanView(LoginRequiredMixin, UserPassesTestMixin, KeysetPaginationMixin, ListView):
     model = VlanModel
     paginate_by = 10
+    keyset_ordering = ('-id',)
     template_name = 'ipm/list_vlan.html'
     context_object_name = 'vlans'
     def test_func(self):
@@ -96,7 +210,10 @@ class ListVlanView(LoginRequiredMixin, UserPassesTestMixin, ListView):
         status = self.request.GET.get('status')
 
         if vlan_name:
-            queryset = queryset.filter(name__icontains=vlan_name)
+            name_filter = Q(name__icontains=vlan_name)
+            if vlan_name.strip().isdecimal():
+                name_filter |= Q(vlan_id=int(vlan_name))
+            queryset = queryset.filter(name_filter)
 
         if vpn_name:
             queryset = queryset.filter(vpn_name__icontains=vpn_name)
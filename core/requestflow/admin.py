@@ -1,5 +1,7 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from .lookup import parse_targets
 from .models import IPRequest, AssignedIP
+from .services import approve_requests
 
 
 @admin.register(IPRequest)
@@ -9,6 +11,21 @@ class IPRequestAdmin(admin.ModelAdmin):
     search_fields = ('user__email', 'reason')
     ordering = ('-created_at',)
     readonly_fields = ('created_at',)
+    actions = ['approve_selected']
+
+    @admin.action(description="Approve selected requests and assign IPs")
+    def approve_selected(self, request, queryset):
+        try:
+            outcomes = approve_requests(queryset)
+        except ValueError as e:
+            self.message_user(request, f"Bulk approval failed: {e}", messages.ERROR)
+            return
+        approved = sum(1 for _, error in outcomes if error is None)
+        if approved:
+            self.message_user(request, f"Approved {approved} request(s) and assigned their IPs.", messages.SUCCESS)
+        for ip_request, error in outcomes:
+            if error is not None:
+                self.message_user(request, f"Request #{ip_request.pk} not approved: {error}", messages.WARNING)
 
 
 @admin.register(AssignedIP)
@@ -17,4 +34,14 @@ class AssignedIPAdmin(admin.ModelAdmin):
     list_filter = ('ip_request__status', 'user')
     search_fields = ('ip_address', 'user__email')
     ordering = ('-created_at',)
-    readonly_fields = ('created_at', 'updated_at')
\ No newline at end of file
+    readonly_fields = ('created_at', 'updated_at')
+
+    def get_search_results(self, request, queryset, search_term):
+        # An address or CIDR is matched on the indexed ip_int, not by substring
+        addresses, networks, errors = parse_targets([search_term])
+        if errors or not (addresses or networks):
+            return super().get_search_results(request, queryset, search_term)
+        if addresses:
+            return queryset.filter(ip_int=addresses[0]), False
+        _, first, last = networks[0]
+        return queryset.filter(ip_int__range=(first, last)), False
\ No newline at end of file
@@ -1,16 +1,41 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.functional import SimpleLazyObject
+
 from .models import IPRequest
 
 
+PENDING_COUNT_CACHE_KEY = 'requestflow:pending_count'
+
+
+def pending_count():
+    """Number of pending requests, cached briefly (cleared by requestflow.signals)."""
+    return cache.get_or_set(
+        PENDING_COUNT_CACHE_KEY,
+        lambda: IPRequest.objects.filter(status='pending').count(),
+        settings.PENDING_COUNT_CACHE_TTL,
+    )
+
+
 def pending_requests(request):
-    """Provide pending IP requests (for superusers) to all templates."""
-    if request.user.is_authenticated and request.user.is_superuser:
-        pending_qs = IPRequest.objects.filter(status='pending').order_by('-created_at')[:10]
-        count = IPRequest.objects.filter(status='pending').count()
-    else:
-        pending_qs = IPRequest.objects.none()
-        count = 0
+    """Provide pending IP requests (for superusers) to all templates.
+
+    Both values are lazy, so pages that never render the navbar badge (or
+    responses that redirect) do not query anything.
+    """
+    def is_admin():
+        return request.user.is_authenticated and request.user.is_superuser
+
+    def latest():
+        if not is_admin():
+            return IPRequest.objects.none()
+        return list(
+            IPRequest.objects.filter(status='pending')
+            .select_related('user', 'vlan')
+            .order_by('-created_at')[:10]
+        )
 
     return {
-        'pending_requests': pending_qs,
-        'pending_requests_count': count,
+        'pending_requests': SimpleLazyObject(latest),
+        'pending_requests_count': SimpleLazyObject(lambda: pending_count() if is_admin() else 0),
     }
@@ -0,0 +1,104 @@
+"""Lease expiry: releasing the addresses of requests whose duration has run out.
+
+Every request stores ``expires_at``, duration_days after it was approved
+(requests approved before ``approved_at`` existed count from creation), indexed
+for approved requests, so expired and soon-to-expire leases are found in
+SQL. Reclaiming deletes the assignments of expired requests at most
+``RECLAIM_CHUNK_SIZE`` rows per DELETE, each chunk in its own short
+transaction, and marks the requests ``expired`` once their addresses are
+gone. The deletes are plain SQL that skip the per-row post_delete
+handlers, so every chunk updates the pools' ``used_count`` and occupancy
+bitmaps itself in the same transaction. An interrupted run leaves the
+remaining requests approved and expired, and the next run picks them up.
+"""
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from dashboard.metrics import invalidate_metrics
+from ipm.models import IPPoolModel, PoolOccupancy
+from .models import AssignedIP, IPRequest
+
+
+# Assignments per DELETE statement
+RECLAIM_CHUNK_SIZE = 1000
+
+# Requests handled per pass
+RECLAIM_REQUEST_BATCH = 500
+
+# Default window of the "expiring soon" listings, in days
+EXPIRING_DAYS = 7
+
+
+def _delete_rows(pks):
+    """DELETE the AssignedIP rows ``pks`` in one statement and return the row count.
+
+    QuerySet.delete() would load every row to send post_delete, whose
+    per-row handler (uncount_assigned_ip) release_assignments replaces with
+    bulk updates, so the rows are deleted with plain SQL instead.
+    """
+    table = connection.ops.quote_name(AssignedIP._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE id IN ({', '.join(['%s'] * len(pks))})", pks)
+        return cursor.rowcount
+
+
+def release_assignments(rows):
+    """Delete assignments given as (pk, pool id, ip_int) rows and free their addresses.
+
+    Runs one DELETE plus one counter UPDATE and one bitmap update per pool,
+    all in one transaction, so the pools' used_count and occupancy bitmaps
+    never disagree with the remaining rows.
+    """
+    if not rows:
+        return 0
+    by_pool = defaultdict(list)
+    for _, pool_id, ip_int in rows:
+        if pool_id:
+            by_pool[pool_id].append(ip_int)
+    with transaction.atomic():
+        deleted = _delete_rows([pk for pk, _, _ in rows])
+        for pool in IPPoolModel.objects.filter(pk__in=by_pool):
+            addresses = by_pool[pool.pk]
+            # Floored at zero so a drifted counter cannot fail the chunk
+            IPPoolModel.objects.filter(pk=pool.pk).update(
+                used_count=Greatest(F('used_count') - len(addresses), Value(0)),
+            )
+            PoolOccupancy.mark(pool, addresses, used=False)
+    return deleted
+
+
+def reclaim_expired(now=None, chunk_size=RECLAIM_CHUNK_SIZE, request_batch=RECLAIM_REQUEST_BATCH):
+    """Release the addresses of every request expired at ``now``.
+
+    Returns (requests expired, addresses released).
+    """
+    now = now or timezone.now()
+    expired_requests = released = 0
+    while True:
+        ids = list(
+            IPRequest.objects.expired(now).order_by('expires_at', 'id').values_list('id', flat=True)[:request_batch]
+        )
+        if not ids:
+            break
+        assignments = AssignedIP.objects.filter(ip_request_id__in=ids).order_by('id')
+        while True:
+            with transaction.atomic():
+                rows = list(assignments.values_list('id', 'pool_id', 'ip_int')[:chunk_size])
+                released += release_assignments(rows)
+            if len(rows) < chunk_size:
+                break
+        # update() skips save(), so the search vector and expires_at stay as they are
+        expired_requests += IPRequest.objects.filter(pk__in=ids, status='approved').update(status='expired')
+    if expired_requests or released:
+        invalidate_metrics()
+    return expired_requests, released
+
+
+def expired_summary(now=None):
+    """(requests, addresses) that reclaim_expired would release at ``now``."""
+    expired = IPRequest.objects.expired(now)
+    return expired.count(), AssignedIP.objects.filter(ip_request__in=expired).count()
@@ -0,0 +1,102 @@
+"""Streaming exports of assigned IPs as CSV or newline-delimited JSON.
+
+Rows are read with ``.values_list().iterator(chunk_size=...)`` and written
+one line at a time, so memory stays flat however many assignments match
+(on PostgreSQL the iterator uses a server-side cursor). CSV cells that a
+spreadsheet would read as a formula are prefixed with a quote.
+"""
+import csv
+import json
+
+from .models import AssignedIP
+
+
+FORMAT_CSV = 'csv'
+FORMAT_NDJSON = 'ndjson'
+EXPORT_FORMATS = (FORMAT_CSV, FORMAT_NDJSON)
+
+CONTENT_TYPES = {
+    FORMAT_CSV: 'text/csv',
+    FORMAT_NDJSON: 'application/x-ndjson',
+}
+
+# Rows fetched per round trip while streaming
+EXPORT_CHUNK_SIZE = 2000
+
+# (column name, ORM lookup) in output order
+EXPORT_COLUMNS = [
+    ('ip_address', 'ip_address'),
+    ('pool_id', 'pool_id'),
+    ('vlan_id', 'vlan__vlan_id'),
+    ('vlan_name', 'vlan__name'),
+    ('user_email', 'user__email'),
+    ('request_id', 'ip_request_id'),
+    ('request_status', 'ip_request__status'),
+    ('assigned_by_admin', 'assigned_by_admin'),
+    ('is_monitored', 'is_monitored'),
+    ('description', 'description'),
+    ('created_at', 'created_at'),
+]
+
+# Leading characters that make spreadsheets evaluate a cell as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def export_queryset(pool=None, vlan=None, user=None, status=None):
+    """Assigned IPs matching the given filters, in (pool, address) order.
+
+    ``pool`` is a primary key, ``vlan`` the VLAN number (as in the exported
+    ``vlan_id`` column), ``user`` a primary key or an email address and
+    ``status`` an IPRequest status. Raises ValueError for a ``user`` that
+    is neither.
+    """
+    qs = AssignedIP.objects.all()
+    if pool:
+        qs = qs.filter(pool_id=pool)
+    if vlan:
+        qs = qs.filter(vlan__vlan_id=vlan)
+    if user:
+        user = str(user)
+        if '@' in user:
+            qs = qs.filter(user__email=user)
+        elif user.isdecimal():
+            qs = qs.filter(user_id=int(user))
+        else:
+            raise ValueError(f"User must be an id or an email address, not {user!r}.")
+    if status:
+        qs = qs.filter(ip_request__status=status)
+    return qs.order_by('pool_id', 'ip_int').values_list(*(lookup for _, lookup in EXPORT_COLUMNS))
+
+
+class _Echo:
+    """File-like object whose write() hands the line back to csv.writer's caller."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def iter_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow([name for name, _ in EXPORT_COLUMNS])
+    for row in rows:
+        yield writer.writerow([_csv_value(value) for value in row])
+
+
+def iter_ndjson(rows):
+    names = [name for name, _ in EXPORT_COLUMNS]
+    for row in rows:
+        yield json.dumps(dict(zip(names, row)), default=_csv_value) + '\n'
+
+
+def iter_export(queryset, fmt=FORMAT_CSV, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield the lines of ``queryset`` (from export_queryset) in ``fmt``."""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    rows = queryset.iterator(chunk_size=chunk_size)
+    return iter_csv(rows) if fmt == FORMAT_CSV else iter_ndjson(rows)
@@ -4,6 +4,9 @@ from ipaddress import ip_address
 from .models import IPRequest
 from ipm.models import IPPoolModel,VlanModel
 from requestflow.models import AssignedIP
+from requestflow.services import (
+    POOL_MOST_FREE, POOL_POLICY_CHOICES, STRATEGY_CHOICES, STRATEGY_FIRST,
+)
 import ipaddress as _ip
 
 class IPRequestForm(forms.ModelForm):
@@ -46,6 +49,12 @@ class AdminReviewForm(forms.ModelForm):
                                                  widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g., 192.168.1.10'}))
     manual_end_ip = forms.GenericIPAddressField(protocol='IPv4', required=False, label='End IP',
                                                widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g., 192.168.1.20'}))
+    allocation_strategy = forms.ChoiceField(choices=STRATEGY_CHOICES, required=False, initial=STRATEGY_FIRST,
+                                            label='Allocation strategy',
+                                            widget=forms.Select(attrs={'class': 'form-select'}))
+    pool_policy = forms.ChoiceField(choices=POOL_POLICY_CHOICES, required=False, initial=POOL_MOST_FREE,
+                                    label='Auto pool policy',
+                                    widget=forms.Select(attrs={'class': 'form-select'}))
     class Meta:
         model = IPRequest
         fields = ['status', 'admin_comment', 'selected_ippool']
@@ -69,15 +78,14 @@ class AdminReviewForm(forms.ModelForm):
         else:
             # Fallback: show no pools if VLAN is missing
             self.fields['selected_ippool'].queryset = IPPoolModel.objects.none()
+        # No pool selected means the server picks one (see services.auto_assign)
+        self.fields['selected_ippool'].empty_label = 'Auto (server picks a pool)'
 
     def clean(self):
         cleaned_data = super().clean()
         status = cleaned_data.get('status')
         pool = cleaned_data.get('selected_ippool')
 
-        if status == 'approved' and not pool:
-            raise ValidationError("You must select an IP pool when approving a request.")
-
         manual = cleaned_data.get('manual_assign')
         start_ip = cleaned_data.get('manual_start_ip')
         end_ip = cleaned_data.get('manual_end_ip')
@@ -123,21 +131,8 @@ class AdminReviewForm(forms.ModelForm):
                             f'Current size is {selected_count}.'
                         )
 
-                    # Check for conflicts with already assigned IPs in the same VLAN
-                    vlan = pool.vlan
-                    # Build list of IP strings in range; limit to reasonable size (required count)
-                    ip_list = [str(_ip.IPv4Address(int(s) + i)) for i in range(required)]
-                    conflicts = set(
-                        AssignedIP.objects.filter(
-                            ip_request__selected_ippool__vlan=vlan,
-                            ip_address__in=ip_list
-                        ).values_list('ip_address', flat=True)
-                    )
-                    if conflicts:
-                        conflict_example = next(iter(conflicts))
-                        raise ValidationError(
-                            f"One or more IPs in the selected range are already assigned. Example: {conflict_example}"
-                        )
+                    # Conflicts with assigned IPs are checked once, under the
+                    # VLAN lock, when the view assigns the range
 
         # If approving and NOT manual, ensure pool has enough free IPs
         if status == 'approved' and pool and not manual and self.instance:
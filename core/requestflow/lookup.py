@@ -0,0 +1,88 @@
+"""Reverse lookup: who holds an IPv4 address or the addresses of a network.
+
+Single addresses are resolved ``LOOKUP_BATCH_SIZE`` at a time with one
+``ip_int IN (...)`` query per batch, and each CIDR with one ``ip_int``
+range query, both answered by the index on AssignedIP.ip_int. An address
+is unique per VLAN, so the same address may come back once per VLAN.
+"""
+import ipaddress
+
+from .models import AssignedIP
+
+
+# Addresses per IN (...) query
+LOOKUP_BATCH_SIZE = 1000
+
+# Rows fetched per round trip when streaming a network's assignments
+LOOKUP_CHUNK_SIZE = 2000
+
+LOOKUP_FIELDS = (
+    'ip_address', 'ip_int', 'user__email', 'ip_request_id', 'ip_request__status', 'ip_request__expires_at',
+    'pool_id', 'pool__ip_range_start', 'pool__ip_range_end', 'vlan__vlan_id', 'vlan__name',
+)
+
+
+def parse_targets(values):
+    """Split ``values`` into (sorted unique addresses as integers, networks, errors).
+
+    Networks are (label, first, last) tuples; host bits of a CIDR are ignored.
+    """
+    addresses, networks, errors = set(), [], []
+    for value in values:
+        value = str(value or '').strip()
+        if not value:
+            continue
+        try:
+            if '/' in value:
+                network = ipaddress.IPv4Network(value, strict=False)
+                networks.append((str(network), int(network.network_address), int(network.broadcast_address)))
+            else:
+                addresses.add(int(ipaddress.IPv4Address(value)))
+        except ValueError:
+            errors.append(f"'{value}' is not an IPv4 address or network.")
+    return sorted(addresses), networks, errors
+
+
+def _owner(row):
+    values = dict(zip(LOOKUP_FIELDS, row))
+    expires_at = values['ip_request__expires_at']
+    pool = (
+        f"{values['pool__ip_range_start']} - {values['pool__ip_range_end']}"
+        if values['pool_id'] else None
+    )
+    return {
+        'ip': values['ip_address'],
+        'user': values['user__email'],
+        'request_id': values['ip_request_id'],
+        'request_status': values['ip_request__status'],
+        'pool_id': values['pool_id'],
+        'pool': pool,
+        'vlan_id': values['vlan__vlan_id'],
+        'vlan': values['vlan__name'],
+        'expires_at': expires_at.isoformat() if expires_at else None,
+    }
+
+
+def assigned_addresses(addresses, batch_size=LOOKUP_BATCH_SIZE):
+    """The subset of ``addresses`` (integers) assigned in any VLAN."""
+    found = set()
+    for i in range(0, len(addresses), batch_size):
+        found.update(
+            AssignedIP.objects.filter(ip_int__in=addresses[i:i + batch_size]).values_list('ip_int', flat=True)
+        )
+    return found
+
+
+def lookup_owners(addresses, networks=(), batch_size=LOOKUP_BATCH_SIZE):
+    """Yield an owner dict for every assignment of ``addresses`` and inside ``networks``.
+
+    ``addresses`` are integers (see parse_targets); assignments inside a
+    network come back in address order.
+    """
+    rows = AssignedIP.objects.order_by('ip_int', 'vlan_id').values_list(*LOOKUP_FIELDS)
+    for i in range(0, len(addresses), batch_size):
+        for row in rows.filter(ip_int__in=addresses[i:i + batch_size]):
+            yield _owner(row)
+    for _, first, last in networks:
+        for row in rows.filter(ip_int__range=(first, last)).iterator(chunk_size=LOOKUP_CHUNK_SIZE):
+            yield _owner(row)
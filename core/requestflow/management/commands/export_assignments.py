@@ -0,0 +1,32 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from requestflow.exports import EXPORT_FORMATS, FORMAT_CSV, export_queryset, iter_export
+from requestflow.models import IPRequest
+
+
+class Command(BaseCommand):
+    help = "Stream assigned IPs as CSV or NDJSON, optionally filtered by pool, VLAN, user or request status."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default=FORMAT_CSV)
+        parser.add_argument('--pool', type=int, help="IP pool id.")
+        parser.add_argument('--vlan', type=int, help="VLAN number (the vlan_id column).")
+        parser.add_argument('--user', help="User id or email.")
+        parser.add_argument('--status', choices=[value for value, _ in IPRequest.STATUS_CHOICES])
+        parser.add_argument('--output', '-o', help="File to write (default: stdout).")
+
+    def handle(self, *args, **options):
+        try:
+            queryset = export_queryset(
+                pool=options['pool'], vlan=options['vlan'], user=options['user'], status=options['status'],
+            )
+        except ValueError as exc:
+            raise CommandError(exc)
+        lines = iter_export(queryset, options['format'])
+        if options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as out:
+                out.writelines(lines)
+        else:
+            sys.stdout.writelines(lines)
@@ -0,0 +1,47 @@
+import csv
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from requestflow.lookup import lookup_owners, parse_targets
+from requestflow.models import int_to_ip, ip_to_int
+
+COLUMNS = ('ip', 'user', 'request_id', 'request_status', 'pool_id', 'pool', 'vlan_id', 'vlan', 'expires_at')
+
+
+class Command(BaseCommand):
+    help = "Show who holds IPv4 addresses or the addresses of CIDR networks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('targets', nargs='*', help="Addresses or CIDRs, e.g. 10.0.0.5 10.1.0.0/24.")
+        parser.add_argument('--file', '-f', help="Read targets from a file, one per line ('-' for stdin).")
+        parser.add_argument('--format', choices=('csv', 'ndjson'), default='csv')
+
+    def handle(self, *args, **options):
+        values = list(options['targets'])
+        if options['file']:
+            stream = sys.stdin if options['file'] == '-' else open(options['file'], encoding='utf-8')
+            with stream:
+                values += stream.read().split()
+        if not values:
+            raise CommandError("Give at least one address or CIDR, or --file.")
+
+        addresses, networks, errors = parse_targets(values)
+        for error in errors:
+            self.stderr.write(error)
+
+        found = set()
+        writer = csv.DictWriter(self.stdout, fieldnames=COLUMNS, lineterminator='\n')
+        if options['format'] == 'csv':
+            writer.writeheader()
+        for owner in lookup_owners(addresses, networks):
+            found.add(ip_to_int(owner['ip']))
+            if options['format'] == 'csv':
+                writer.writerow(owner)
+            else:
+                self.stdout.write(json.dumps(owner))
+
+        for ip in addresses:
+            if ip not in found:
+                self.stderr.write(f"{int_to_ip(ip)}: unassigned")
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from requestflow.expiry import RECLAIM_CHUNK_SIZE, expired_summary, reclaim_expired
+
+
+class Command(BaseCommand):
+    help = (
+        "Release the IPs of expired requests in chunked deletes and mark the requests expired. "
+        "A lease lasts duration_days from approval; requests approved before approval times "
+        "were recorded count from their creation date."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Report what would be released without deleting.")
+        parser.add_argument('--chunk-size', type=int, default=RECLAIM_CHUNK_SIZE, help="Assignments per DELETE.")
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help="Keep running and reclaim every INTERVAL seconds (default: run once).",
+        )
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            requests, addresses = expired_summary()
+            self.stdout.write(f"{requests} expired request(s) holding {addresses} IP(s) (dry run, nothing deleted).")
+            return
+
+        while True:
+            requests, addresses = reclaim_expired(chunk_size=max(options['chunk_size'], 1))
+            self.stdout.write(self.style.SUCCESS(
+                f"Expired {requests} request(s) and released {addresses} IP(s)."
+            ))
+            if options['interval'] <= 0:
+                return
+            time.sleep(options['interval'])
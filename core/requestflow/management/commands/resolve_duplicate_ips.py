@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count, Min
+from django.db.models.functions import Coalesce
+
+from requestflow.models import AssignedIP
+
+# Rows per DELETE
+DELETE_BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        "List addresses assigned more than once in a VLAN, which stop migration requestflow 0006. "
+        "With --delete, keep the oldest assignment of each and delete the others."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--delete', action='store_true', help="Delete the extra assignments.")
+
+    def handle(self, *args, **options):
+        # Only columns that exist before migration 0006 are read: the VLAN is
+        # derived the way that migration backfills it
+        rows = AssignedIP.objects.filter(ip_int__isnull=False).annotate(
+            vlan_key=Coalesce('ip_request__selected_ippool__vlan_id', 'ip_request__vlan_id'),
+        )
+        groups = (
+            rows.values('vlan_key', 'ip_int')
+            .annotate(total=Count('id'), keep=Min('id'))
+            .filter(total__gt=1)
+            .order_by('vlan_key', 'ip_int')
+        )
+        extra = []
+        for group in groups:
+            duplicates = (
+                rows.filter(vlan_key=group['vlan_key'], ip_int=group['ip_int'])
+                .exclude(pk=group['keep'])
+                .order_by('pk')
+            )
+            for pk, ip_address, request_id in duplicates.values_list('pk', 'ip_address', 'ip_request_id'):
+                self.stdout.write(
+                    f"{ip_address} in VLAN #{group['vlan_key']}: assignment #{pk} (request #{request_id}) "
+                    f"duplicates #{group['keep']}"
+                )
+                extra.append(pk)
+
+        if not extra:
+            self.stdout.write("No duplicate assignments.")
+            return
+        if not options['delete']:
+            self.stdout.write(f"{len(extra)} duplicate assignment(s); rerun with --delete to remove them.")
+            return
+
+        # Plain SQL: before migration 0006 the model has columns the table
+        # lacks, so QuerySet.delete() cannot load the rows. After it the
+        # unique constraint leaves nothing to delete here.
+        table = connection.ops.quote_name(AssignedIP._meta.db_table)
+        with transaction.atomic(), connection.cursor() as cursor:
+            for i in range(0, len(extra), DELETE_BATCH_SIZE):
+                batch = extra[i:i + DELETE_BATCH_SIZE]
+                cursor.execute(f"DELETE FROM {table} WHERE id IN ({', '.join(['%s'] * len(batch))})", batch)
+        self.stdout.write(self.style.SUCCESS(f"Deleted {len(extra)} duplicate assignment(s)."))
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.5 on 2026-10-18 09:00
+
+import ipaddress
+
+from django.db import migrations, models
+
+
+def backfill_ip_int(apps, schema_editor):
+    AssignedIP = apps.get_model('requestflow', 'AssignedIP')
+    batch = []
+    for obj in AssignedIP.objects.filter(ip_int__isnull=True).only('id', 'ip_address').iterator(chunk_size=2000):
+        try:
+            obj.ip_int = int(ipaddress.ip_address(obj.ip_address))
+        except ValueError:
+            continue
+        batch.append(obj)
+        if len(batch) >= 2000:
+            AssignedIP.objects.bulk_update(batch, ['ip_int'])
+            batch = []
+    if batch:
+        AssignedIP.objects.bulk_update(batch, ['ip_int'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('requestflow', '0004_alter_iprequest_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assignedip',
+            name='ip_int',
+            field=models.BigIntegerField(blank=True, db_index=True, editable=False, null=True, verbose_name='Numeric IP'),
+        ),
+        migrations.RunPython(backfill_ip_int, migrations.RunPython.noop),
+    ]
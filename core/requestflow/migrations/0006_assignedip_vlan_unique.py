@@ -0,0 +1,68 @@
+# Generated by Django 5.2.5 on 2026-10-18 09:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_vlan(apps, schema_editor):
+    AssignedIP = apps.get_model('requestflow', 'AssignedIP')
+    batch = []
+    qs = AssignedIP.objects.filter(vlan__isnull=True).select_related('ip_request__selected_ippool')
+    for obj in qs.iterator(chunk_size=2000):
+        pool = obj.ip_request.selected_ippool
+        obj.vlan_id = pool.vlan_id if pool else obj.ip_request.vlan_id
+        batch.append(obj)
+        if len(batch) >= 2000:
+            AssignedIP.objects.bulk_update(batch, ['vlan'])
+            batch = []
+    if batch:
+        AssignedIP.objects.bulk_update(batch, ['vlan'])
+
+
+def check_duplicates(apps, schema_editor):
+    """Stop before AddConstraint if an address is assigned twice in a VLAN.
+
+    Nothing is deleted here: the duplicates are listed and the migration
+    fails, so an operator can review them with
+    ``manage.py resolve_duplicate_ips`` and rerun migrate.
+    """
+    AssignedIP = apps.get_model('requestflow', 'AssignedIP')
+    duplicates = list(
+        AssignedIP.objects.filter(ip_int__isnull=False)
+        .values('vlan_id', 'ip_address')
+        .annotate(total=models.Count('id'))
+        .filter(total__gt=1)
+        .order_by('vlan_id', 'ip_address')[:21]
+    )
+    if duplicates:
+        listed = ', '.join(
+            f"{row['ip_address']} in VLAN #{row['vlan_id']} ({row['total']}x)" for row in duplicates[:20]
+        )
+        more = ' and more' if len(duplicates) > 20 else ''
+        raise RuntimeError(
+            f"Addresses assigned more than once in a VLAN: {listed}{more}. "
+            "Review them with 'python manage.py resolve_duplicate_ips' and remove the extra "
+            "assignments (--delete keeps the oldest of each) before migrating again."
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ipm', '0003_alter_vlanmodel_vpn_name'),
+        ('requestflow', '0005_assignedip_ip_int'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assignedip',
+            name='vlan',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='assigned_ips', to='ipm.vlanmodel', verbose_name='VLAN'),
+        ),
+        migrations.RunPython(backfill_vlan, migrations.RunPython.noop),
+        migrations.RunPython(check_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='assignedip',
+            constraint=models.UniqueConstraint(fields=('vlan', 'ip_int'), name='unique_assigned_ip_per_vlan'),
+        ),
+    ]
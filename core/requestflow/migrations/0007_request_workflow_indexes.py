@@ -0,0 +1,36 @@
+# Generated by Django 5.2.5 on 2026-10-18 12:36
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ipm', '0005_ippoolmodel_range_ints'),
+        ('requestflow', '0006_assignedip_vlan_unique'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='assignedip',
+            index=models.Index(fields=['ip_request', 'ip_int'], name='assignedip_request_ip_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='iprequest',
+            index=models.Index(fields=['status', '-created_at', '-id'], name='iprequest_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='iprequest',
+            index=models.Index(fields=['user', 'status'], name='iprequest_user_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='iprequest',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='iprequest_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='iprequest',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['-created_at'], name='iprequest_pending_idx'),
+        ),
+    ]
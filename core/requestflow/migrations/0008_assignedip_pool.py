@@ -0,0 +1,36 @@
+# Generated by Django 5.2.5 on 2026-10-18 12:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_pool(apps, schema_editor):
+    AssignedIP = apps.get_model('requestflow', 'AssignedIP')
+    IPRequest = apps.get_model('requestflow', 'IPRequest')
+    AssignedIP.objects.filter(pool__isnull=True).update(
+        pool=Subquery(IPRequest.objects.filter(pk=OuterRef('ip_request')).values('selected_ippool')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ipm', '0005_ippoolmodel_range_ints'),
+        ('requestflow', '0007_request_workflow_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assignedip',
+            name='pool',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='assigned_ips', to='ipm.ippoolmodel', verbose_name='IP Pool'),
+        ),
+        migrations.RunPython(backfill_pool, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='assignedip',
+            index=models.Index(fields=['pool', 'ip_int'], name='assignedip_pool_ip_idx'),
+        ),
+    ]
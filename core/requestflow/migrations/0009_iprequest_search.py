@@ -0,0 +1,32 @@
+# Generated by Django 5.2.5 on 2026-10-18 12:45
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ipm', '0007_vlan_search'),
+        ('requestflow', '0008_assignedip_pool'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='iprequest',
+            name='search_vector',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.SearchVector('reason', config='simple', weight='A'), '||', django.contrib.postgres.search.SearchVector('admin_comment', config='simple', weight='B'), django.contrib.postgres.search.SearchConfig('simple')), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        migrations.AddIndex(
+            model_name='iprequest',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='iprequest_search_vector_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='iprequest',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('reason'), name='gin_trgm_ops'), name='iprequest_reason_trgm_idx'),
+        ),
+    ]
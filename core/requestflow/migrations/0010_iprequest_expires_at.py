@@ -0,0 +1,49 @@
+# Generated by Django 5.2.5 on 2026-10-18 12:52
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_expires_at(apps, schema_editor):
+    IPRequest = apps.get_model('requestflow', 'IPRequest')
+    if schema_editor.connection.vendor == 'postgresql':
+        # One UPDATE: created_at + duration_days * interval '1 day'
+        IPRequest.objects.update(expires_at=models.F('created_at') + models.ExpressionWrapper(
+            models.F('duration_days') * models.Value(timedelta(days=1)),
+            output_field=models.DurationField(),
+        ))
+        return
+    rows = []
+    for request in IPRequest.objects.only('id', 'created_at', 'duration_days').iterator(chunk_size=2000):
+        request.expires_at = request.created_at + timedelta(days=request.duration_days)
+        rows.append(request)
+    IPRequest.objects.bulk_update(rows, ['expires_at'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ipm', '0007_vlan_search'),
+        ('requestflow', '0009_iprequest_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='iprequest',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name='iprequest',
+            name='status',
+            field=models.CharField(choices=[('pending', 'In progress'), ('approved', ' Approved '), ('rejected', 'Rejected'), ('expired', 'Expired')], default='pending', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='iprequest',
+            index=models.Index(condition=models.Q(('status', 'approved')), fields=['expires_at', 'id'], name='iprequest_expiry_idx'),
+        ),
+        migrations.RunPython(fill_expires_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('requestflow', '0010_iprequest_expires_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='iprequest',
+            name='approved_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -2,6 +2,9 @@ from django.db import models
 
 # Create your models here.
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db.models.functions import Upper
+from django.contrib.postgres.search import SearchVectorField
 from accounts.models import User
 
 from django.core.exceptions import ValidationError
@@ -9,10 +12,32 @@ import ipaddress
 from django.db import transaction
 from django.utils import timezone
 from datetime import timedelta
+from core.search import search_document
 
 
+def ip_to_int(value):
+    """Return the integer form of an IP address string (None if invalid)."""
+    try:
+        return int(ipaddress.ip_address(value))
+    except (ValueError, TypeError):
+        return None
 
 
+def int_to_ip(value):
+    """Return the dotted IPv4 string for an integer address."""
+    return str(ipaddress.IPv4Address(int(value)))
+
+
+
+class IPRequestQuerySet(models.QuerySet):
+    def expired(self, now=None):
+        """Approved requests whose lease ended at or before ``now``."""
+        return self.filter(status='approved', expires_at__lte=now or timezone.now())
+
+    def expiring(self, days, now=None):
+        """Approved requests whose lease ends within the next ``days`` days."""
+        now = now or timezone.now()
+        return self.filter(status='approved', expires_at__gt=now, expires_at__lte=now + timedelta(days=days))
 
 
 class IPRequest(models.Model):
@@ -20,6 +45,7 @@ class IPRequest(models.Model):
         ('pending', 'In progress'),
         ('approved', ' Approved '),
         ('rejected', 'Rejected'),
+        ('expired', 'Expired'),
     ]
 
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -39,14 +65,66 @@ class IPRequest(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
-   
+    # When the request was approved: the lease runs from here
+    approved_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    # Lease end, (approved_at or created_at) + duration_days, stored so leases
+    # can be filtered and reclaimed in SQL (see requestflow.expiry)
+    expires_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = IPRequestQuerySet.as_manager()
+
+    # (field, weight) pairs indexed in search_vector
+    SEARCH_FIELDS = (('reason', 'A'), ('admin_comment', 'B'))
+
+    # Full-text document of SEARCH_FIELDS, generated by PostgreSQL on every write
+    search_vector = models.GeneratedField(
+        expression=search_document(*SEARCH_FIELDS), output_field=SearchVectorField(), db_persist=True,
+    )
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='iprequest_search_vector_idx'),
+            GinIndex(OpClass(Upper('reason'), name='gin_trgm_ops'), name='iprequest_reason_trgm_idx'),
+            # Admin list, dashboard and keyset pagination: status filter, newest first
+            models.Index(fields=['status', '-created_at', '-id'], name='iprequest_status_created_idx'),
+            # My requests list and per-user review stats
+            models.Index(fields=['user', 'status'], name='iprequest_user_status_idx'),
+            models.Index(fields=['user', '-created_at', '-id'], name='iprequest_user_created_idx'),
+            # Navbar badge and review queue only ever look at pending requests
+            models.Index(
+                fields=['-created_at'], name='iprequest_pending_idx',
+                condition=models.Q(status='pending'),
+            ),
+            # Reclaim and "expiring soon" listings only look at live leases
+            models.Index(
+                fields=['expires_at', 'id'], name='iprequest_expiry_idx',
+                condition=models.Q(status='approved'),
+            ),
+        ]
 
 
     def __str__(self):
         return f"Request #{self.id} by {self.user.email}"
 
+    def lease_expiry(self):
+        """End of the lease: duration_days after approval (or creation, until approved)."""
+        start = self.approved_at or self.created_at or timezone.now()
+        return start + timedelta(days=int(self.duration_days or 0))
+
+    def save(self, *args, **kwargs):
+        if self.status == 'approved' and self.approved_at is None:
+            self.approved_at = timezone.now()
+        self.expires_at = self.lease_expiry()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'status', 'duration_days'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'approved_at', 'expires_at'}
+        super().save(*args, **kwargs)
+
     @property
     def end_date(self):
+        if self.expires_at:
+            return self.expires_at
         try:
             return (self.created_at + timedelta(days=int(self.duration_days)))
         except Exception:
@@ -60,52 +138,42 @@ class IPRequest(models.Model):
         remaining = (end_date - today).days
         return remaining if remaining > 0 else 0
  
-    def assign_ips(self):
+    def assign_ips(self, strategy='first'):
+        from .services import allocate_ips, assign_addresses, locked_allocation
+
         if self.status != 'approved':
             raise ValueError("Request must be approved before assigning IPs.")
         if not self.selected_ippool:
             raise ValueError("No IP pool selected for this request.")
 
-        vlan = self.selected_ippool.vlan
-
+        pool = self.selected_ippool
 
-        existing_ips = set(
-              AssignedIP.objects.filter(ip_request__selected_ippool__vlan=vlan)
-             .values_list('ip_address', flat=True)
-            )
-
-
-
-        # Generate IP range from pool
-        start_ip = ipaddress.ip_address(self.selected_ippool.ip_range_start)
-        end_ip = ipaddress.ip_address(self.selected_ippool.ip_range_end)
-
-        available_ips = []
-        current_ip = start_ip
-
-        while current_ip <= end_ip and len(available_ips) < self.ip_count:
-            if str(current_ip) not in existing_ips:
-                available_ips.append(str(current_ip))
-            current_ip += 1
-
-        if len(available_ips) < self.ip_count:
-            raise ValueError("Not enough available IPs in this VLAN's pool.")
-
-        # Assign IPs atomically
-        with transaction.atomic():
-            for ip in available_ips:
-               AssignedIP.objects.create(
-               ip_request=self,
-               user=self.user,
-               ip_address=ip,
-               
-            )
+        # Pick and assign IPs atomically while holding the VLAN lock
+        return locked_allocation(
+            pool.vlan,
+            lambda: assign_addresses(
+                self, pool, allocate_ips(pool, self.ip_count, strategy), check_conflicts=False,
+            ),
+        )
 
 
 class AssignedIP(models.Model):
     ip_request = models.ForeignKey(IPRequest, on_delete=models.CASCADE, related_name='assigned_ips')
     user = models.ForeignKey(User, on_delete=models.CASCADE)
+    # Pool and VLAN the address was assigned from, fixed at assignment time so
+    # later edits to the request's selected pool do not move the address.
+    # Addresses are unique per VLAN.
+    pool = models.ForeignKey(
+        'ipm.IPPoolModel', on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='assigned_ips', verbose_name="IP Pool", db_index=False
+    )
+    vlan = models.ForeignKey(
+        'ipm.VlanModel', on_delete=models.CASCADE, null=True, blank=True,
+        related_name='assigned_ips', verbose_name="VLAN"
+    )
     ip_address = models.GenericIPAddressField()
+    # Integer form of ip_address, kept in sync on save, for indexed range lookups
+    ip_int = models.BigIntegerField(null=True, blank=True, editable=False, db_index=True, verbose_name="Numeric IP")
    
     description = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -114,22 +182,46 @@ class AssignedIP(models.Model):
     assigned_by_admin = models.BooleanField(default=False, verbose_name="Assigned by Admin")
     is_monitored = models.BooleanField(default=False, verbose_name="Monitoring Enabled")
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['vlan', 'ip_int'], name='unique_assigned_ip_per_vlan'),
+        ]
+        indexes = [
+            # Per-request count and first/last address summaries
+            models.Index(fields=['ip_request', 'ip_int'], name='assignedip_request_ip_idx'),
+            # Per-pool occupancy, counts and first/last used address
+            models.Index(fields=['pool', 'ip_int'], name='assignedip_pool_ip_idx'),
+        ]
 
 
     def __str__(self):
         return f"{self.ip_address} → {self.user.email} (Request #{self.ip_request.id})"
+
+    def save(self, *args, **kwargs):
+        self.ip_int = ip_to_int(self.ip_address)
+        if self.pool_id is None and self.ip_request_id:
+            self.pool_id = self.ip_request.selected_ippool_id
+        if self.vlan_id is None and self.ip_request_id:
+            self.vlan_id = self.pool.vlan_id if self.pool_id else self.ip_request.vlan_id
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'ip_address' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'ip_int'}
+        super().save(*args, **kwargs)
+
     def clean(self):
         super().clean()
 
-        # Ensure IP is unique across all AssignedIP entries
-        if AssignedIP.objects.exclude(pk=self.pk).filter(ip_address=self.ip_address).exists():
-            raise ValidationError(f"IP address {self.ip_address} is already assigned.")
-
-        # Ensure IP is within the selected IP pool range
-        if not self.ip_request or not self.ip_request.selected_ippool:
+        # Ensure IP is within the assigned (or selected) IP pool range
+        pool = self.pool or (self.ip_request.selected_ippool if self.ip_request_id else None)
+        if not self.ip_request_id or not pool:
             raise ValidationError("IPRequest or its selected IP pool is missing.")
 
-        pool = self.ip_request.selected_ippool
+        # Ensure IP is unique within its VLAN (unique_assigned_ip_per_vlan)
+        vlan_id = self.vlan_id or pool.vlan_id
+        ip_int = ip_to_int(self.ip_address)
+        if AssignedIP.objects.exclude(pk=self.pk).filter(vlan_id=vlan_id, ip_int=ip_int).exists():
+            raise ValidationError(f"IP address {self.ip_address} is already assigned in this VLAN.")
+
         try:
             ip = ipaddress.IPv4Address(self.ip_address)
             start_ip = ipaddress.IPv4Address(pool.ip_range_start)
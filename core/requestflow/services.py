@@ -0,0 +1,494 @@
+"""IP allocation services shared by IPRequest and the admin review views."""
+import ipaddress
+
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Min, Q, Window
+from django.db.models.functions import Lag, Lead
+from django.utils import timezone
+
+from dashboard.metrics import invalidate_metrics
+from ipm.models import IPPoolModel, PoolOccupancy, VlanModel
+from .context_processors import PENDING_COUNT_CACHE_KEY
+from .models import AssignedIP, IPRequest, int_to_ip
+
+
+STRATEGY_FIRST = 'first'
+STRATEGY_CONTIGUOUS = 'contiguous'
+STRATEGY_BEST_FIT = 'best_fit'
+
+# Rows per INSERT statement when bulk creating assignments
+BULK_BATCH_SIZE = 1000
+
+# Attempts made when a concurrent assignment wins the unique constraint
+ALLOCATION_RETRIES = 3
+
+STRATEGY_CHOICES = [
+    (STRATEGY_FIRST, 'First free addresses'),
+    (STRATEGY_CONTIGUOUS, 'First contiguous block'),
+    (STRATEGY_BEST_FIT, 'Best-fit contiguous block'),
+]
+
+# How the server picks a pool when the admin leaves it to "auto"
+POOL_MOST_FREE = 'most_free'
+POOL_MOST_FULL = 'most_full'
+POOL_CONTIGUOUS_FIT = 'contiguous_fit'
+
+POOL_POLICY_CHOICES = [
+    (POOL_MOST_FREE, 'Most free addresses'),
+    (POOL_MOST_FULL, 'Fullest pool that fits (packing)'),
+    (POOL_CONTIGUOUS_FIT, 'Tightest contiguous block that fits'),
+]
+
+
+def pool_bounds(pool):
+    """Return the (start, end) integer bounds of an IP pool."""
+    start = int(ipaddress.IPv4Address(pool.ip_range_start))
+    end = int(ipaddress.IPv4Address(pool.ip_range_end))
+    return start, end
+
+
+def occupied_in_range(vlan, start, end):
+    """Assigned IPs of a VLAN whose numeric address lies in [start, end]."""
+    return AssignedIP.objects.filter(
+        vlan=vlan,
+        ip_int__range=(start, end),
+    )
+
+
+def range_conflicts(vlan, start, end):
+    """Return (count, lowest address) of the assigned IPs in [start, end].
+
+    A single bounded range aggregate, however large the range is.
+    """
+    result = occupied_in_range(vlan, start, end).aggregate(total=Count('id'), first=Min('ip_int'))
+    sample = int_to_ip(result['first']) if result['first'] is not None else None
+    return result['total'], sample
+
+
+def free_gaps(pool):
+    """Return the free (start, end) integer ranges of a pool in address order.
+
+    Only the occupied addresses that border a hole are read back: LAG/LEAD
+    over the numeric IP give each used address its neighbours, so the
+    database returns one row per gap instead of one row per assignment.
+    """
+    start, end = pool_bounds(pool)
+    rows = (
+        occupied_in_range(pool.vlan, start, end)
+        .annotate(
+            prev_ip=Window(Lag('ip_int'), order_by=F('ip_int').asc()),
+            next_ip=Window(Lead('ip_int'), order_by=F('ip_int').asc()),
+        )
+        .filter(
+            Q(prev_ip__isnull=True)
+            | Q(next_ip__isnull=True)
+            | Q(next_ip__gt=F('ip_int') + 1)
+        )
+        .order_by('ip_int')
+        .values_list('ip_int', 'prev_ip', 'next_ip')
+    )
+
+    gaps = []
+    found = False
+    for ip, prev_ip, next_ip in rows:
+        found = True
+        if prev_ip is None and ip > start:
+            gaps.append((start, ip - 1))
+        if next_ip is None:
+            if ip < end:
+                gaps.append((ip + 1, end))
+        elif next_ip > ip + 1:
+            gaps.append((ip + 1, next_ip - 1))
+    if not found:
+        gaps.append((start, end))
+    return gaps
+
+
+def take_from_gaps(gaps, count, strategy=STRATEGY_FIRST):
+    """Pick ``count`` addresses from ``gaps`` and return (addresses, remaining gaps).
+
+    ``gaps`` is a list of free (start, end) ranges in address order, as
+    returned by free_gaps; it is not modified. ``first`` takes the lowest
+    free addresses even if they are scattered, ``contiguous`` takes the
+    first gap large enough for the whole block and ``best_fit`` takes the
+    smallest such gap to limit fragmentation.
+    Raises ValueError if the gaps cannot satisfy the request.
+    """
+    if strategy == STRATEGY_FIRST:
+        selected = []
+        remaining = list(gaps)
+        while remaining and len(selected) < count:
+            gap_start, gap_end = remaining[0]
+            take = min(count - len(selected), gap_end - gap_start + 1)
+            selected.extend(range(gap_start, gap_start + take))
+            if gap_start + take > gap_end:
+                remaining.pop(0)
+            else:
+                remaining[0] = (gap_start + take, gap_end)
+        if len(selected) < count:
+            raise ValueError("Not enough available IPs in this VLAN's pool.")
+        return selected, remaining
+
+    if strategy not in (STRATEGY_CONTIGUOUS, STRATEGY_BEST_FIT):
+        raise ValueError(f"Unknown allocation strategy: {strategy}")
+
+    fitting = [i for i, (gap_start, gap_end) in enumerate(gaps) if gap_end - gap_start + 1 >= count]
+    if not fitting:
+        raise ValueError(f"No contiguous block of {count} free IPs in this VLAN's pool.")
+    if strategy == STRATEGY_BEST_FIT:
+        index = min(fitting, key=lambda i: gaps[i][1] - gaps[i][0])
+    else:
+        index = fitting[0]
+    gap_start, gap_end = gaps[index]
+    rest = [(gap_start + count, gap_end)] if gap_start + count <= gap_end else []
+    return list(range(gap_start, gap_start + count)), gaps[:index] + rest + gaps[index + 1:]
+
+
+def bitmap_gaps(pool):
+    """Free gaps of ``pool`` read from its occupancy bitmap, or None without a usable one."""
+    # Read afresh rather than through pool.occupancy, which may be cached
+    # from before the caller took the VLAN lock
+    occupancy = PoolOccupancy.objects.filter(pool=pool).first()
+    if occupancy is None or occupancy.size != pool.total_ip_count:
+        return None
+    return occupancy.free_gaps(pool.ip_range_start_int)
+
+
+def _free_in_pool(pool, addresses):
+    """True if none of ``addresses`` (sorted integers) is assigned in the pool's VLAN; one indexed EXISTS."""
+    return not occupied_in_range(pool.vlan, addresses[0], addresses[-1]).filter(ip_int__in=addresses).exists()
+
+
+def allocate_ips(pool, count, strategy=STRATEGY_FIRST):
+    """Pick ``count`` free addresses from a pool and return them as integers.
+
+    The candidates come from the pool's occupancy bitmap, so no assignment
+    rows are scanned. They are confirmed against AssignedIP with one
+    indexed EXISTS; if the bitmap has drifted (or is missing), the exact
+    gaps from free_gaps are used instead. See take_from_gaps for the
+    strategies. Raises ValueError if the pool cannot satisfy the request.
+    """
+    gaps = bitmap_gaps(pool)
+    if gaps is not None:
+        try:
+            addresses = take_from_gaps(gaps, count, strategy)[0]
+        except ValueError:
+            addresses = None
+        if addresses and _free_in_pool(pool, addresses):
+            return addresses
+    return take_from_gaps(free_gaps(pool), count, strategy)[0]
+
+
+def vlan_pools(vlan):
+    """Active pools of ``vlan`` with their bitmaps, in one query.
+
+    Each pool gets ``gaps`` (its free ranges), ``free`` (free addresses)
+    and ``largest_block`` (longest free run), all from the same source: the
+    occupancy bitmap when the pool has a usable one, the exact gaps from
+    free_gaps otherwise (``gaps_exact`` tells which).
+    """
+    pools = list(
+        IPPoolModel.objects.filter(vlan=vlan, is_active=True)
+        .select_related('vlan', 'occupancy')
+        .order_by('ip_range_start_int')
+    )
+    for pool in pools:
+        occupancy = getattr(pool, 'occupancy', None)
+        pool.gaps_exact = occupancy is None or occupancy.size != pool.total_ip_count
+        if pool.gaps_exact:
+            pool.gaps = free_gaps(pool)
+        else:
+            pool.gaps = occupancy.free_gaps(pool.ip_range_start_int)
+        sizes = [end - start + 1 for start, end in pool.gaps]
+        pool.free = sum(sizes)
+        pool.largest_block = max(sizes, default=0)
+    return pools
+
+
+def needs_contiguous(policy=POOL_MOST_FREE, strategy=STRATEGY_FIRST):
+    """True if ``policy`` or ``strategy`` asks for the addresses as one block."""
+    return strategy != STRATEGY_FIRST or policy == POOL_CONTIGUOUS_FIT
+
+
+def choose_pool(pools, count, policy=POOL_MOST_FREE, strategy=STRATEGY_FIRST):
+    """Return the pool of ``pools`` (from vlan_pools) that ``policy`` picks for ``count`` addresses.
+
+    Only pools that can hold the request count: enough free addresses, or
+    a large enough free block when the strategy or policy needs contiguous
+    addresses. Ranking and fitting both use the ``free`` and
+    ``largest_block`` figures that vlan_pools read together. Returns None if
+    no single pool fits.
+    """
+    if needs_contiguous(policy, strategy):
+        fitting = [(pool, pool.largest_block) for pool in pools if pool.largest_block >= count]
+    else:
+        fitting = [(pool, pool.free) for pool in pools if pool.free >= count]
+    if not fitting:
+        return None
+    if policy == POOL_MOST_FREE:
+        return max(fitting, key=lambda item: item[0].free)[0]
+    if policy == POOL_MOST_FULL:
+        return min(fitting, key=lambda item: item[0].free)[0]
+    if policy == POOL_CONTIGUOUS_FIT:
+        return min(fitting, key=lambda item: item[1])[0]
+    raise ValueError(f"Unknown pool policy: {policy}")
+
+
+def span_pools(pools, count, policy=POOL_MOST_FREE, strategy=STRATEGY_FIRST):
+    """Split ``count`` addresses over several pools (from vlan_pools), most free first.
+
+    Addresses are taken from each pool's ``gaps``; bitmap gaps are confirmed
+    with one EXISTS per pool and replaced by the exact free_gaps if they
+    have drifted. Pools never share a block, so a request whose ``policy``
+    or ``strategy`` needs contiguous addresses cannot be spread and raises
+    ValueError, as does a request the pools together cannot hold.
+    Returns a list of (pool, addresses).
+    """
+    if needs_contiguous(policy, strategy):
+        raise ValueError(f"No contiguous block of {count} free IPs in this VLAN's pools.")
+    plan = []
+    remaining = count
+    for pool in sorted(pools, key=lambda pool: pool.free, reverse=True):
+        if remaining == 0:
+            break
+        if pool.free <= 0:
+            continue
+        addresses, _ = take_from_gaps(pool.gaps, min(remaining, pool.free))
+        if not pool.gaps_exact and not _free_in_pool(pool, addresses):
+            gaps = free_gaps(pool)
+            available = sum(end - start + 1 for start, end in gaps)
+            addresses, _ = take_from_gaps(gaps, min(remaining, available))
+        if addresses:
+            plan.append((pool, addresses))
+            remaining -= len(addresses)
+    if remaining:
+        raise ValueError("Not enough available IPs in this VLAN's pools.")
+    return plan
+
+
+def auto_assign(ip_request, policy=POOL_MOST_FREE, strategy=STRATEGY_FIRST):
+    """Pick a pool for ``ip_request`` and assign its addresses under the VLAN lock.
+
+    If no single active pool of the VLAN can hold the request, the addresses
+    are spread over several pools (span_pools), unless the policy or
+    strategy asked for a contiguous block, which raises ValueError.
+    ``selected_ippool`` is set to the pool that holds the most of them; the
+    caller saves the request. Returns the created AssignedIP rows.
+    """
+    def allocate():
+        pools = vlan_pools(ip_request.vlan)
+        pool = choose_pool(pools, ip_request.ip_count, policy, strategy)
+        if pool is not None:
+            if policy == POOL_CONTIGUOUS_FIT and strategy == STRATEGY_FIRST:
+                pool_strategy = STRATEGY_CONTIGUOUS
+            else:
+                pool_strategy = strategy
+            plan = [(pool, allocate_ips(pool, ip_request.ip_count, pool_strategy))]
+        else:
+            plan = span_pools(pools, ip_request.ip_count, policy, strategy)
+        created = []
+        for pool, addresses in plan:
+            created += assign_addresses(ip_request, pool, addresses, check_conflicts=False)
+        ip_request.selected_ippool = max(plan, key=lambda item: len(item[1]))[0]
+        return created
+
+    return locked_allocation(ip_request.vlan, allocate)
+
+
+def assign_addresses(ip_request, pool, addresses, assigned_by_admin=False,
+                     batch_size=BULK_BATCH_SIZE, check_conflicts=True):
+    """Bulk create AssignedIP rows for ``addresses`` (integers) in ``pool``.
+
+    Applies the same rules as AssignedIP.clean for the whole batch at once:
+    every address must lie in the pool range, must not already be assigned
+    in the pool's VLAN and the request must not end up with more addresses
+    than it asked for. Rows are inserted ``batch_size`` at a time.
+    Raises ValueError on the first rule that fails.
+
+    Callers that already know the addresses are free (the allocator, or a
+    form that ran range_conflicts) pass ``check_conflicts=False``; the
+    (vlan, ip_int) unique constraint still rejects any race.
+    """
+    addresses = sorted(set(addresses))
+    if not addresses:
+        return []
+
+    start, end = pool_bounds(pool)
+    if addresses[0] < start or addresses[-1] > end:
+        raise ValueError(
+            f"IP addresses must be within the pool range {pool.ip_range_start} - {pool.ip_range_end}."
+        )
+
+    already = ip_request.assigned_ips.count()
+    if already + len(addresses) > ip_request.ip_count:
+        raise ValueError(f"Cannot assign more than {ip_request.ip_count} IPs for this request.")
+
+    if check_conflicts:
+        taken = set(
+            occupied_in_range(pool.vlan, addresses[0], addresses[-1]).values_list('ip_int', flat=True)
+        )
+        conflicts = taken.intersection(addresses)
+        if conflicts:
+            raise ValueError(f"IP {int_to_ip(min(conflicts))} is already assigned.")
+
+    objs = [
+        AssignedIP(
+            ip_request=ip_request,
+            user_id=ip_request.user_id,
+            pool_id=pool.pk,
+            vlan_id=pool.vlan_id,
+            ip_address=int_to_ip(ip),
+            ip_int=ip,
+            assigned_by_admin=assigned_by_admin,
+        )
+        for ip in addresses
+    ]
+    with transaction.atomic():
+        created = AssignedIP.objects.bulk_create(objs, batch_size=batch_size)
+        # bulk_create sends no post_save, so bump the pool counter here
+        IPPoolModel.objects.filter(pk=pool.pk).update(used_count=F('used_count') + len(created))
+        PoolOccupancy.mark(pool, addresses, used=True)
+    invalidate_metrics()
+    return created
+
+
+def locked_allocation(vlan, allocate, retries=ALLOCATION_RETRIES):
+    """Run ``allocate()`` in a transaction holding a row lock on ``vlan``.
+
+    Addresses are unique per VLAN, so locking the VLAN row serialises every
+    approval that could pick the same addresses. If a writer that skipped the
+    lock still wins the (vlan, ip_int) unique constraint, the transaction is
+    rolled back and the allocation is recomputed, up to ``retries`` times.
+    """
+    for attempt in range(retries):
+        try:
+            with transaction.atomic():
+                list(VlanModel.objects.select_for_update().filter(pk=vlan.pk).values_list('pk', flat=True))
+                return allocate()
+        except IntegrityError:
+            if attempt + 1 == retries:
+                raise ValueError("IP addresses were assigned concurrently. Please try again.")
+
+
+def _approve_pass(ip_requests, strategy, batch_size):
+    """One locked allocation pass of approve_requests; returns the outcomes."""
+    requests = list(ip_requests.select_related('selected_ippool__vlan').order_by('pk'))
+    if not requests:
+        return []
+
+    # Addresses are unique per VLAN: lock every VLAN involved, in a fixed
+    # order so two batches cannot deadlock
+    vlan_ids = sorted({ip_request.vlan_id for ip_request in requests})
+    list(VlanModel.objects.select_for_update().filter(pk__in=vlan_ids).order_by('pk').values_list('pk', flat=True))
+
+    # Re-read the statuses under the locks: a concurrent approval of the same
+    # requests has committed by now and must not get a second set of addresses
+    pending = list(
+        IPRequest.objects.select_for_update(of=('self',))
+        .select_related('selected_ippool__vlan')
+        .filter(pk__in=[ip_request.pk for ip_request in requests], status='pending')
+        .order_by('pk')
+    )
+    pending_ids = {ip_request.pk for ip_request in pending}
+    outcomes = [
+        (ip_request, "Request is not pending.") for ip_request in requests if ip_request.pk not in pending_ids
+    ]
+    if not pending:
+        return outcomes
+
+    pools_by_vlan = defaultdict(list)
+    for pool in IPPoolModel.objects.filter(vlan_id__in=vlan_ids, is_active=True).select_related('vlan').order_by('ip_range_start_int'):
+        pools_by_vlan[pool.vlan_id].append(pool)
+    already = dict(
+        AssignedIP.objects.filter(ip_request__in=pending)
+        .values('ip_request').annotate(total=Count('id')).values_list('ip_request', 'total')
+    )
+
+    now = timezone.now()
+    gaps = {}                        # pool id -> free gaps, read once per pool
+    taken = defaultdict(list)        # pool id -> addresses allocated in this pass
+    pools = {}
+    rows = []
+    approved = []
+    for ip_request in sorted(pending, key=lambda r: (r.created_at, r.pk)):
+        needed = ip_request.ip_count - already.get(ip_request.pk, 0)
+        candidates = [ip_request.selected_ippool] if ip_request.selected_ippool_id else pools_by_vlan[ip_request.vlan_id]
+        if not candidates:
+            outcomes.append((ip_request, "No active IP pool in this VLAN."))
+            continue
+
+        error = None
+        for pool in candidates:
+            if pool.pk not in gaps:
+                gaps[pool.pk] = free_gaps(pool)
+            try:
+                addresses, gaps[pool.pk] = take_from_gaps(gaps[pool.pk], needed, strategy)
+            except ValueError as e:
+                error = str(e)
+                continue
+            break
+        else:
+            outcomes.append((ip_request, error))
+            continue
+
+        pools[pool.pk] = pool
+        taken[pool.pk].extend(addresses)
+        rows.extend(
+            AssignedIP(
+                ip_request=ip_request, user_id=ip_request.user_id, pool_id=pool.pk, vlan_id=pool.vlan_id,
+                ip_address=int_to_ip(ip), ip_int=ip, assigned_by_admin=False,
+            )
+            for ip in addresses
+        )
+        ip_request.status = 'approved'
+        ip_request.selected_ippool = pool
+        ip_request.approved_at = now
+        ip_request.expires_at = ip_request.lease_expiry()
+        approved.append(ip_request)
+        outcomes.append((ip_request, None))
+
+    AssignedIP.objects.bulk_create(rows, batch_size=batch_size)
+    IPRequest.objects.bulk_update(
+        approved, ['status', 'selected_ippool', 'approved_at', 'expires_at'], batch_size=batch_size,
+    )
+    # bulk writes send no signals: update the pool counters and bitmaps here
+    for pool_id, addresses in taken.items():
+        IPPoolModel.objects.filter(pk=pool_id).update(used_count=F('used_count') + len(addresses))
+        PoolOccupancy.mark(pools[pool_id], addresses, used=True)
+    return outcomes
+
+
+def approve_requests(ip_requests, strategy=STRATEGY_FIRST, batch_size=BULK_BATCH_SIZE, retries=ALLOCATION_RETRIES):
+    """Approve many pending requests with a single allocation pass.
+
+    The VLANs involved are locked once. The free gaps of each pool are read
+    once, and addresses are carved from those in-memory gaps for every
+    request, oldest first. A request uses its selected pool, or otherwise
+    the first active pool of its VLAN that has room. All rows are inserted
+    with bulk_create and the statuses saved with bulk_update, in one
+    transaction.
+
+    Returns a list of (request, error) pairs in which error is None for
+    approved requests. Requests that cannot be served stay pending and do
+    not stop the others. Statuses are re-read with the rows locked, so a
+    request approved concurrently is reported as not pending instead of
+    receiving a second set of addresses. If a concurrent writer wins the
+    unique constraint, the whole pass is rolled back and retried, up to
+    ``retries`` times.
+    ``ip_requests`` is an IPRequest queryset.
+    """
+    for attempt in range(retries):
+        try:
+            with transaction.atomic():
+                # Each pass reloads the requests, so a rolled back pass leaves nothing stale
+                outcomes = _approve_pass(ip_requests, strategy, batch_size)
+            break
+        except IntegrityError:
+            if attempt + 1 == retries:
+                raise ValueError("IP addresses were assigned concurrently. Please try again.")
+    cache.delete(PENDING_COUNT_CACHE_KEY)
+    invalidate_metrics()
+    return outcomes
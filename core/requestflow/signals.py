@@ -1,7 +1,12 @@
 # ipm/signals.py
-from django.db.models.signals import post_save
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from .models import IPRequest
+from django.core.cache import cache
+from dashboard.metrics import invalidate_metrics
+from ipm.models import IPPoolModel, PoolOccupancy, VlanModel
+from .context_processors import PENDING_COUNT_CACHE_KEY
+from .models import IPRequest, AssignedIP
 
 
 # @receiver(post_save, sender=IPRequest)
@@ -15,4 +20,48 @@ from .models import IPRequest
 #             instance.assign_ips()
 #         except Exception as e:
 #             # Optional: log or handle errors
-#             print(f"IP assignment failed for Request #{instance.id}: {e}")
\ No newline at end of file
+#             print(f"IP assignment failed for Request #{instance.id}: {e}")
+
+
+@receiver(post_save, sender=AssignedIP)
+def count_assigned_ip(sender, instance, created, raw=False, **kwargs):
+    """Keep IPPoolModel.used_count in step with single-row assignments."""
+    if not created or raw:
+        return
+    if instance.pool_id:
+        IPPoolModel.objects.filter(pk=instance.pool_id).update(used_count=F('used_count') + 1)
+        PoolOccupancy.mark(instance.pool, [instance.ip_int], used=True)
+
+
+@receiver(post_delete, sender=AssignedIP)
+def uncount_assigned_ip(sender, instance, **kwargs):
+    """Release the address from its pool's used_count."""
+    if instance.pool_id:
+        IPPoolModel.objects.filter(pk=instance.pool_id, used_count__gt=0).update(used_count=F('used_count') - 1)
+        pool = IPPoolModel.objects.filter(pk=instance.pool_id).first()
+        if pool is not None:
+            PoolOccupancy.mark(pool, [instance.ip_int], used=False)
+
+
+@receiver(post_save, sender=IPPoolModel)
+def rebuild_pool_occupancy(sender, instance, raw=False, **kwargs):
+    """New pools get a bitmap; an edited range shifts every offset, so rebuild."""
+    if not raw:
+        PoolOccupancy.rebuild(instance)
+
+
+def invalidate_dashboard_metrics(sender, **kwargs):
+    """Any change to requests, assignments or inventory makes the dashboard stale."""
+    invalidate_metrics()
+
+
+for _model in (IPRequest, AssignedIP, IPPoolModel, VlanModel):
+    post_save.connect(invalidate_dashboard_metrics, sender=_model, dispatch_uid=f'dashboard_metrics_save_{_model.__name__}')
+    post_delete.connect(invalidate_dashboard_metrics, sender=_model, dispatch_uid=f'dashboard_metrics_delete_{_model.__name__}')
+
+
+@receiver(post_save, sender=IPRequest)
+@receiver(post_delete, sender=IPRequest)
+def invalidate_pending_count(sender, **kwargs):
+    """New, reviewed or deleted requests change the navbar pending count."""
+    cache.delete(PENDING_COUNT_CACHE_KEY)
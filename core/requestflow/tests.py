@@ -1,3 +1,337 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.core.management import CommandError, call_command
+from django.db import connection
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User
+from ipm.models import IPPoolModel, PoolOccupancy, VlanModel
+from .expiry import reclaim_expired, release_assignments
+from .exports import export_queryset, iter_export
+from .models import IPRequest
+from .services import (
+    POOL_CONTIGUOUS_FIT, POOL_MOST_FREE, STRATEGY_BEST_FIT, STRATEGY_CONTIGUOUS, STRATEGY_FIRST,
+    allocate_ips, approve_requests, assign_addresses, auto_assign, choose_pool, free_gaps, range_conflicts,
+    take_from_gaps, vlan_pools,
+)
+
+
+class WorkflowDataMixin:
+    """A VLAN with two pools and a requester, shared by the request workflow tests."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(email='admin@example.com', password='pw')
+        cls.user = User.objects.create_user(email='user@example.com', password='pw')
+        cls.vlan = VlanModel.objects.create(name='VLAN 10', vlan_id=10, status=True)
+        cls.pool = IPPoolModel.objects.create(
+            vlan=cls.vlan, ip_range_start='10.0.0.1', ip_range_end='10.0.0.100',
+            subnet_mask='255.255.255.0', gateway='10.0.0.1',
+        )
+        cls.pool2 = IPPoolModel.objects.create(
+            vlan=cls.vlan, ip_range_start='10.0.1.1', ip_range_end='10.0.1.50',
+            subnet_mask='255.255.255.0', gateway='10.0.1.1',
+        )
+
+    def make_request(self, ip_count, status='pending', user=None, **kwargs):
+        return IPRequest.objects.create(
+            user=user or self.user, vlan=self.vlan, ip_count=ip_count, reason='test',
+            duration_days=kwargs.pop('duration_days', 30), status=status, **kwargs,
+        )
+
+
+
+class AllocatorTests(WorkflowDataMixin, TestCase):
+    """free_gaps, take_from_gaps and allocate_ips on a fragmented pool."""
+
+    def setUp(self):
+        # Used: offsets 0-1, 5 and 10-11 of the first pool
+        self.start = self.pool.ip_range_start_int
+        holder = self.make_request(5, status='approved')
+        assign_addresses(holder, self.pool, [self.start + offset for offset in (0, 1, 5, 10, 11)])
+
+    def offsets(self, addresses):
+        return [ip - self.start for ip in addresses]
+
+    def test_free_gaps(self):
+        self.assertEqual(
+            [(first - self.start, last - self.start) for first, last in free_gaps(self.pool)],
+            [(2, 4), (6, 9), (12, 99)],
+        )
+
+    def test_take_from_gaps_strategies(self):
+        gaps = [(1, 2), (5, 9), (20, 22)]
+        self.assertEqual(take_from_gaps(gaps, 4), ([1, 2, 5, 6], [(7, 9), (20, 22)]))
+        self.assertEqual(take_from_gaps(gaps, 3, STRATEGY_CONTIGUOUS)[0], [5, 6, 7])
+        self.assertEqual(take_from_gaps(gaps, 3, STRATEGY_BEST_FIT), ([20, 21, 22], [(1, 2), (5, 9)]))
+        with self.assertRaisesMessage(ValueError, "No contiguous block of 6"):
+            take_from_gaps(gaps, 6, STRATEGY_CONTIGUOUS)
+        with self.assertRaisesMessage(ValueError, "Not enough available IPs"):
+            take_from_gaps(gaps, 11)
+        with self.assertRaisesMessage(ValueError, "Unknown allocation strategy"):
+            take_from_gaps(gaps, 1, 'random')
+
+    def test_allocate_ips_strategies(self):
+        self.assertEqual(self.offsets(allocate_ips(self.pool, 4)), [2, 3, 4, 6])
+        self.assertEqual(self.offsets(allocate_ips(self.pool, 4, STRATEGY_CONTIGUOUS)), [6, 7, 8, 9])
+        self.assertEqual(self.offsets(allocate_ips(self.pool, 3, STRATEGY_BEST_FIT)), [2, 3, 4])
+        with self.assertRaises(ValueError):
+            allocate_ips(self.pool, 89, STRATEGY_CONTIGUOUS)
+
+    def test_allocate_ips_ignores_a_drifted_bitmap(self):
+        PoolOccupancy.mark(self.pool, [self.start, self.start + 1], used=False)
+        self.assertEqual(self.offsets(allocate_ips(self.pool, 2)), [2, 3])
+        PoolOccupancy.objects.filter(pool=self.pool).delete()
+        self.assertEqual(self.offsets(allocate_ips(self.pool, 2)), [2, 3])
+
+
+
+class AssignAddressesTests(WorkflowDataMixin, TestCase):
+    def setUp(self):
+        self.start = self.pool.ip_range_start_int
+        self.ip_request = self.make_request(3, status='approved')
+
+    def test_creates_rows_and_counts_them(self):
+        created = assign_addresses(self.ip_request, self.pool, [self.start + 2, self.start, self.start + 2])
+        self.assertEqual([row.ip_int for row in created], [self.start, self.start + 2])
+        self.assertEqual({row.vlan_id for row in created}, {self.vlan.pk})
+        self.pool.refresh_from_db()
+        self.assertEqual(self.pool.used_count, 2)
+
+    def test_rejects_addresses_outside_the_pool(self):
+        for address in (self.start - 1, self.pool.ip_range_end_int + 1):
+            with self.subTest(address=address), self.assertRaisesMessage(ValueError, "within the pool range"):
+                assign_addresses(self.ip_request, self.pool, [address])
+
+    def test_rejects_more_than_requested(self):
+        assign_addresses(self.ip_request, self.pool, [self.start])
+        with self.assertRaisesMessage(ValueError, "Cannot assign more than 3 IPs"):
+            assign_addresses(self.ip_request, self.pool, range(self.start + 1, self.start + 4))
+        self.assertEqual(self.ip_request.assigned_ips.count(), 1)
+
+    def test_rejects_addresses_taken_in_the_vlan(self):
+        other = self.make_request(1, status='approved')
+        assign_addresses(other, self.pool, [self.start + 1])
+        with self.assertRaisesMessage(ValueError, "IP 10.0.0.2 is already assigned."):
+            assign_addresses(self.ip_request, self.pool, [self.start, self.start + 1])
+        self.assertFalse(self.ip_request.assigned_ips.exists())
+
+
+@skipUnless(connection.vendor == 'postgresql', "EXPLAIN plans are PostgreSQL specific")
+class RequestListIndexTests(WorkflowDataMixin, TestCase):
+    """The admin and "my requests" list queries are answered by the workflow indexes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        users = User.objects.bulk_create([User(email=f'seed{i}@example.com') for i in range(50)])
+        statuses = ['approved'] * 8 + ['rejected', 'pending']
+        IPRequest.objects.bulk_create(
+            [
+                IPRequest(
+                    user=users[i % len(users)], vlan=cls.vlan, ip_count=1, reason='seed',
+                    duration_days=30, status=statuses[i % len(statuses)],
+                )
+                for i in range(5000)
+            ],
+            batch_size=1000,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE requestflow_iprequest')
+
+    def assertUsesIndex(self, queryset, *index_names):
+        plan = queryset.explain()
+        self.assertTrue(any(name in plan for name in index_names), plan)
+
+    def test_admin_list_uses_status_index(self):
+        for status in ('pending', 'approved'):
+            self.assertUsesIndex(
+                IPRequest.objects.filter(status=status).order_by('-created_at', '-id')[:10],
+                'iprequest_pending_idx', 'iprequest_status_created_idx',
+            )
+
+    def test_my_requests_list_uses_user_index(self):
+        user = User.objects.get(email='seed7@example.com')
+        self.assertUsesIndex(
+            IPRequest.objects.filter(user=user).order_by('-created_at', '-id')[:10],
+            'iprequest_user_created_idx',
+        )
+        self.assertUsesIndex(
+            IPRequest.objects.filter(user=user, status='approved').order_by('-created_at', '-id')[:10],
+            'iprequest_user_created_idx', 'iprequest_user_status_idx',
+        )
+
+
+class LeaseExpiryTests(WorkflowDataMixin, TestCase):
+    def approve(self, ip_request):
+        ip_request.status = 'approved'
+        ip_request.selected_ippool = self.pool
+        ip_request.save()
+        ip_request.assign_ips()
+        return ip_request
+
+    def test_lease_runs_from_approval(self):
+        ip_request = self.make_request(2, duration_days=5)
+        IPRequest.objects.filter(pk=ip_request.pk).update(created_at=timezone.now() - timedelta(days=10))
+        ip_request.refresh_from_db()
+        self.approve(ip_request)
+        self.assertGreater(ip_request.expires_at, timezone.now() + timedelta(days=4))
+        self.assertFalse(IPRequest.objects.expired().filter(pk=ip_request.pk).exists())
+        self.assertTrue(IPRequest.objects.expiring(7).filter(pk=ip_request.pk).exists())
+
+    def test_reclaim_releases_addresses_in_chunks(self):
+        expired = self.approve(self.make_request(5))
+        live = self.approve(self.make_request(3))
+        IPRequest.objects.filter(pk=expired.pk).update(expires_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(reclaim_expired(chunk_size=2), (1, 5))
+
+        expired.refresh_from_db()
+        self.assertEqual(expired.status, 'expired')
+        self.assertFalse(expired.assigned_ips.exists())
+        self.assertEqual(live.assigned_ips.count(), 3)
+        self.pool.refresh_from_db()
+        self.assertEqual(self.pool.used_count, 3)
+        self.assertEqual(PoolOccupancy.objects.get(pool=self.pool).used_count, 3)
+        self.assertEqual(reclaim_expired(), (0, 0))
+
+    def test_release_syncs_counters_and_bitmaps_of_every_pool(self):
+        ip_request = self.make_request(5, status='approved')
+        start, start2 = self.pool.ip_range_start_int, self.pool2.ip_range_start_int
+        assign_addresses(ip_request, self.pool, [start, start + 1])
+        assign_addresses(ip_request, self.pool2, range(start2, start2 + 3))
+        rows = list(ip_request.assigned_ips.order_by('ip_int').values_list('id', 'pool_id', 'ip_int'))
+
+        self.assertEqual(release_assignments(rows[1:]), 4)
+
+        self.assertEqual(list(ip_request.assigned_ips.values_list('id', flat=True)), [rows[0][0]])
+        for pool, used in ((self.pool, 1), (self.pool2, 0)):
+            pool.refresh_from_db()
+            self.assertEqual((pool.used_count, PoolOccupancy.objects.get(pool=pool).used_count), (used, used))
+        call_command('verify_pool_bitmaps', stdout=StringIO())
+
+    def test_drifted_counter_is_floored_at_zero(self):
+        ip_request = self.approve(self.make_request(4))
+        IPPoolModel.objects.filter(pk=self.pool.pk).update(used_count=1)
+        IPRequest.objects.filter(pk=ip_request.pk).update(expires_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(reclaim_expired(), (1, 4))
+        self.pool.refresh_from_db()
+        self.assertEqual(self.pool.used_count, 0)
+
+
+class PoolChoiceTests(WorkflowDataMixin, TestCase):
+    def fragment_pool(self):
+        """Use every other address of the first 60 in pool 1: 70 free, at most 41 in a row."""
+        holder = self.make_request(30, status='approved')
+        start = self.pool.ip_range_start_int
+        assign_addresses(holder, self.pool, range(start, start + 60, 2))
+
+    def test_contiguous_fit_without_bitmap_uses_real_gaps(self):
+        self.fragment_pool()
+        PoolOccupancy.objects.filter(pool=self.pool).delete()
+        pools = {pool.pk: pool for pool in vlan_pools(self.vlan)}
+        self.assertEqual((pools[self.pool.pk].free, pools[self.pool.pk].largest_block), (70, 41))
+        self.assertEqual(choose_pool(pools.values(), 45, POOL_CONTIGUOUS_FIT), pools[self.pool2.pk])
+        self.assertEqual(choose_pool(pools.values(), 35, POOL_CONTIGUOUS_FIT), pools[self.pool.pk])
+
+    def test_ranking_uses_bitmap_not_counter(self):
+        IPPoolModel.objects.filter(pk=self.pool.pk).update(used_count=90)
+        pools = vlan_pools(self.vlan)
+        self.assertEqual([pool.free for pool in pools], [100, 50])
+        self.assertEqual(choose_pool(pools, 10, POOL_MOST_FREE).pk, self.pool.pk)
+
+    def test_request_spans_pools_when_none_fits(self):
+        self.fragment_pool()
+        ip_request = self.make_request(110)
+        created = auto_assign(ip_request, POOL_MOST_FREE)
+        self.assertEqual(len(created), 110)
+        self.assertEqual(ip_request.selected_ippool, self.pool)
+        self.assertEqual(ip_request.assigned_ips.filter(pool=self.pool2).count(), 40)
+
+
+    def test_contiguous_request_is_not_spread(self):
+        self.fragment_pool()
+        for policy, strategy in ((POOL_MOST_FREE, STRATEGY_CONTIGUOUS), (POOL_CONTIGUOUS_FIT, STRATEGY_FIRST)):
+            with self.subTest(policy=policy, strategy=strategy):
+                ip_request = self.make_request(60)
+                with self.assertRaisesMessage(ValueError, "No contiguous block of 60 free IPs"):
+                    auto_assign(ip_request, policy, strategy)
+                self.assertFalse(ip_request.assigned_ips.exists())
+
+    def test_spanning_skips_addresses_missing_from_a_drifted_bitmap(self):
+        holder = self.make_request(1, status='approved')
+        assign_addresses(holder, self.pool, [self.pool.ip_range_start_int])
+        PoolOccupancy.mark(self.pool, [self.pool.ip_range_start_int], used=False)
+        ip_request = self.make_request(120)
+        self.assertEqual(len(auto_assign(ip_request, POOL_MOST_FREE)), 120)
+        self.assertEqual(ip_request.assigned_ips.filter(pool=self.pool).count(), 99)
+
+
+class ExportTests(WorkflowDataMixin, TestCase):
+    def test_csv_neutralises_formulas(self):
+        ip_request = self.make_request(1, status='approved')
+        assign_addresses(ip_request, self.pool, [self.pool.ip_range_start_int])
+        ip_request.assigned_ips.update(description='=HYPERLINK("http://example.com")')
+        lines = list(iter_export(export_queryset()))
+        self.assertIn('\'=HYPERLINK', lines[1])
+
+    def test_vlan_filter_takes_the_exported_vlan_number(self):
+        other_vlan = VlanModel.objects.create(name='VLAN 20', vlan_id=20, status=True)
+        ip_request = self.make_request(1, status='approved')
+        assign_addresses(ip_request, self.pool, [self.pool.ip_range_start_int])
+        rows = list(export_queryset(vlan=10))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0][2], 10)
+        self.assertEqual(list(export_queryset(vlan=other_vlan.vlan_id)), [])
+
+    def test_command_rejects_unknown_user(self):
+        with self.assertRaisesMessage(CommandError, "User must be an id or an email address"):
+            call_command('export_assignments', user='nobody', stdout=StringIO())
+
+
+class BulkApproveTests(WorkflowDataMixin, TestCase):
+    def test_only_pending_requests_get_addresses(self):
+        pending = self.make_request(3)
+        approved = self.make_request(2, status='approved')
+        outcomes = dict(approve_requests(IPRequest.objects.filter(pk__in=[pending.pk, approved.pk])))
+        self.assertEqual(
+            {ip_request.pk: error for ip_request, error in outcomes.items()},
+            {pending.pk: None, approved.pk: "Request is not pending."},
+        )
+        pending.refresh_from_db()
+        self.assertEqual((pending.status, pending.assigned_ips.count()), ('approved', 3))
+        self.assertIsNotNone(pending.approved_at)
+        self.assertFalse(approved.assigned_ips.exists())
+
+
+class ManualAssignmentTests(WorkflowDataMixin, TestCase):
+    def review(self, ip_request, start, end):
+        self.client.force_login(self.admin)
+        with mock.patch('requestflow.views.range_conflicts', wraps=range_conflicts) as conflicts:
+            response = self.client.post(reverse('requestflow:admin_review', args=[ip_request.pk]), {
+                'status': 'approved', 'selected_ippool': self.pool.pk, 'admin_comment': '',
+                'manual_assign': 'on', 'manual_start_ip': start, 'manual_end_ip': end,
+            })
+        self.assertEqual(conflicts.call_count, 1)
+        return response
+
+    def test_free_range_is_assigned(self):
+        ip_request = self.make_request(3)
+        self.assertEqual(self.review(ip_request, '10.0.0.1', '10.0.0.3').status_code, 302)
+        self.assertEqual(
+            sorted(ip_request.assigned_ips.values_list('ip_address', flat=True)), ['10.0.0.1', '10.0.0.2', '10.0.0.3'],
+        )
 
-# Create your tests here.
+    def test_conflicting_range_is_rejected_once_under_the_lock(self):
+        assign_addresses(self.make_request(1, status='approved'), self.pool, [self.pool.ip_range_start_int + 1])
+        ip_request = self.make_request(3)
+        response = self.review(ip_request, '10.0.0.1', '10.0.0.3')
+        self.assertContains(response, "1 IP(s) in the selected range are already assigned. Example: 10.0.0.2")
+        ip_request.refresh_from_db()
+        self.assertEqual(ip_request.status, 'pending')
+        self.assertFalse(ip_request.assigned_ips.exists())
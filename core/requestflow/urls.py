@@ -1,7 +1,8 @@
 from django.urls import path
 from .views import (
     IPRequestCreateView, MyRequestListView, AdminRequestListView,
-    AdminReviewView, RequestDetailView, pool_stats
+    AdminReviewView, RequestDetailView, pool_stats, export_assignments,
+    lookup_addresses, bulk_approve, ExpiringRequestListView,
 )
 
 app_name = 'requestflow'
@@ -9,8 +10,12 @@ app_name = 'requestflow'
 urlpatterns = [
     path('new/', IPRequestCreateView.as_view(), name='new_request'),
     path('my/', MyRequestListView.as_view(), name='my_requests'),
+    path('expiring/', ExpiringRequestListView.as_view(), name='expiring_requests'),
     path('admin/', AdminRequestListView.as_view(), name='admin_requests'),
+    path('admin/bulk-approve/', bulk_approve, name='bulk_approve'),
     path('admin/<int:pk>/review/', AdminReviewView.as_view(), name='admin_review'),
     path('admin/<int:pk>/pool-stats/', pool_stats, name='pool_stats'),
+    path('admin/export/', export_assignments, name='export_assignments'),
+    path('lookup/', lookup_addresses, name='lookup_addresses'),
     path('request/<int:pk>/', RequestDetailView.as_view(), name='request_detail'),
 ]
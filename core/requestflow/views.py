@@ -3,13 +3,24 @@ from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.urls import reverse_lazy
 from django.shortcuts import redirect, get_object_or_404
 from django.contrib import messages
-from .models import IPRequest, AssignedIP
+from .models import IPRequest, AssignedIP, int_to_ip
 from .forms import IPRequestForm, AdminReviewForm
+from .services import (
+    BULK_BATCH_SIZE, POOL_MOST_FREE, STRATEGY_CHOICES, STRATEGY_FIRST, approve_requests, assign_addresses,
+    auto_assign, locked_allocation, range_conflicts,
+)
+from .exports import CONTENT_TYPES, EXPORT_FORMATS, FORMAT_CSV, export_queryset, iter_export
+from .lookup import assigned_addresses, lookup_owners, parse_targets
+from .expiry import EXPIRING_DAYS
 from django.db import transaction
+from django.utils import timezone
 import ipaddress
-from django.db.models import Count, Q
-from django.http import JsonResponse, HttpResponseForbidden
+import json
+from django.db.models import Count, Q, Min, Max
+from django.http import JsonResponse, HttpResponseForbidden, HttpResponseNotAllowed, StreamingHttpResponse
 from ipm.models import IPPoolModel
+from core.pagination import KeysetPaginationMixin
+from core.search import ParsedQuery, text_q
 
 
 
@@ -51,34 +62,38 @@ class AdminReviewView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
                         if not (p_start <= s <= p_end and p_start <= e <= p_end and s <= e):
                             raise ValueError("Invalid manual IP range.")
 
-                        # Check for conflicts within VLAN
-                        existing_ips = set(
-                            AssignedIP.objects.filter(ip_request__selected_ippool__vlan=pool.vlan)
-                            .values_list('ip_address', flat=True)
-                        )
-
                         # Ensure range size equals requested ip_count
                         required = int(ip_request.ip_count or 0)
                         selected_count = int(e) - int(s) + 1
                         if selected_count != required:
                             raise ValueError("Manual range size must equal requested IP count.")
 
-                        current = int(s)
-                        created = 0
-                        while current <= int(e):
-                            ip_str = str(ipaddress.IPv4Address(current))
-                            if ip_str in existing_ips:
-                                raise ValueError(f"IP {ip_str} is already assigned.")
-                            AssignedIP.objects.create(
-                                ip_request=ip_request,
-                                user=ip_request.user,
-                                ip_address=ip_str,
-                                assigned_by_admin=True,
+                        def allocate():
+                            # The only conflict check of a manual range, done under the VLAN lock
+                            conflict_count, conflict_example = range_conflicts(pool.vlan, int(s), int(e))
+                            if conflict_count:
+                                raise ValueError(
+                                    f"{conflict_count} IP(s) in the selected range are already assigned. "
+                                    f"Example: {conflict_example}"
+                                )
+                            return assign_addresses(
+                                ip_request, pool, range(int(s), int(e) + 1), assigned_by_admin=True,
+                                check_conflicts=False,
                             )
-                            created += 1
-                            current += 1
+
+                        # A fixed range would only hit the same conflict again, so no retries
+                        locked_allocation(pool.vlan, allocate, retries=1)
+                    elif ip_request.selected_ippool:
+                        ip_request.assign_ips(
+                            strategy=form.cleaned_data.get('allocation_strategy') or STRATEGY_FIRST
+                        )
                     else:
-                        ip_request.assign_ips()
+                        # Auto: pick a pool (or several) and record it on the request
+                        auto_assign(
+                            ip_request,
+                            policy=form.cleaned_data.get('pool_policy') or POOL_MOST_FREE,
+                            strategy=form.cleaned_data.get('allocation_strategy') or STRATEGY_FIRST,
+                        )
                     messages.success(self.request, "Request approved and IPs assigned successfully.")
                     return super().form_valid(form)
             except ValueError as e:
@@ -121,11 +136,12 @@ class IPRequestCreateView(LoginRequiredMixin, CreateView):
         messages.success(self.request, "✅ Request submitted successfully.")
         return super().form_valid(form)
 
-class MyRequestListView(LoginRequiredMixin, ListView):
+class MyRequestListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     model = IPRequest
     template_name = 'requestflow/my_requests.html'
     context_object_name = 'requests'
     paginate_by = 10
+    keyset_ordering = ('-created_at', '-id')
 
     def get_queryset(self):
         qs = IPRequest.objects.filter(user=self.request.user).order_by('-created_at')
@@ -135,12 +151,15 @@ class MyRequestListView(LoginRequiredMixin, ListView):
         if status_filter in {code for code, _ in IPRequest.STATUS_CHOICES}:
             qs = qs.filter(status=status_filter)
 
-        if query:
-            qs = qs.filter(
-                Q(vlan__name__icontains=query)
-                | Q(reason__icontains=query)
-                | Q(id__icontains=query)
-            )
+        parsed = ParsedQuery(query)
+        if parsed.ip is not None:
+            qs = qs.filter(assigned_ips__ip_int=parsed.ip).distinct()
+        elif parsed:
+            condition = text_q(['vlan__name', 'reason'], parsed.text)
+            if parsed.number is not None:
+                # "42" is also request #42: an exact id match instead of casting every id to text
+                condition |= Q(pk=parsed.number)
+            qs = qs.filter(condition)
         return qs
 
     def get_context_data(self, **kwargs):
@@ -171,23 +190,35 @@ class MyRequestListView(LoginRequiredMixin, ListView):
 
 
 
-class AdminRequestListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
+class AdminRequestListView(LoginRequiredMixin, UserPassesTestMixin, KeysetPaginationMixin, ListView):
     model = IPRequest
     template_name = 'requestflow/admin_requests.html'
     context_object_name = 'requests'
     paginate_by = 10  # Show 10 requests per page
+    keyset_ordering = ('-created_at', '-id')
 
     def test_func(self):
         return self.request.user.is_superuser
 
     def get_queryset(self):
         status_filter = self.request.GET.get('status', 'pending')  # Default to 'pending'
-        return IPRequest.objects.filter(status=status_filter).order_by('-created_at')
+        # Summarise assigned IPs in SQL instead of loading them per row
+        return (
+            IPRequest.objects.filter(status=status_filter)
+            .select_related('user', 'vlan', 'selected_ippool')
+            .annotate(
+                assigned_count=Count('assigned_ips'),
+                assigned_first=Min('assigned_ips__ip_int'),
+                assigned_last=Max('assigned_ips__ip_int'),
+            )
+            .order_by('-created_at')
+        )
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['status_filter'] = self.request.GET.get('status', 'pending')
         context['status_choices'] = IPRequest.STATUS_CHOICES
+        context['strategy_choices'] = STRATEGY_CHOICES
 
         # Add counts per status for filter buttons
         counts = IPRequest.objects.values('status').annotate(total=Count('id'))
@@ -209,12 +240,80 @@ class AdminRequestListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
 
 
 
-   
+class ExpiringRequestListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
+    """Approved requests whose lease ends within ``?days=N``, soonest first.
+
+    Filtered and ordered in SQL on the indexed expires_at; regular users
+    only see their own requests.
+    """
+    model = IPRequest
+    template_name = 'requestflow/expiring_requests.html'
+    context_object_name = 'requests'
+    paginate_by = 20
+    keyset_ordering = ('expires_at', 'id')
+    max_days = 365
+
+    def get_days(self):
+        try:
+            days = int(self.request.GET.get('days', EXPIRING_DAYS))
+        except ValueError:
+            days = EXPIRING_DAYS
+        return min(max(days, 1), self.max_days)
+
+    def get_queryset(self):
+        qs = IPRequest.objects.expiring(self.get_days()).select_related('user', 'vlan')
+        if not self.request.user.is_superuser:
+            qs = qs.filter(user=self.request.user)
+        return qs.annotate(assigned_count=Count('assigned_ips')).order_by('expires_at', 'id')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['days'] = self.get_days()
+        context['day_choices'] = [1, 7, 30, 90]
+        return context
+
+
+def bulk_approve(request):
+    """Approve the pending requests ticked on the admin list in one allocation pass."""
+    if not request.user.is_authenticated or not request.user.is_superuser:
+        return HttpResponseForbidden()
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+
+    ids = [int(pk) for pk in request.POST.getlist('selected') if pk.isdigit()]
+    strategy = request.POST.get('allocation_strategy')
+    if strategy not in dict(STRATEGY_CHOICES):
+        strategy = STRATEGY_FIRST
+    if not ids:
+        messages.warning(request, "No requests selected.")
+        return redirect('requestflow:admin_requests')
+
+    try:
+        outcomes = approve_requests(IPRequest.objects.filter(pk__in=ids), strategy=strategy)
+    except ValueError as e:
+        messages.error(request, f"Bulk approval failed: {e}")
+        return redirect('requestflow:admin_requests')
+
+    approved = [ip_request for ip_request, error in outcomes if error is None]
+    if approved:
+        messages.success(request, f"Approved {len(approved)} request(s) and assigned their IPs.")
+    for ip_request, error in outcomes:
+        if error is not None:
+            messages.warning(request, f"Request #{ip_request.pk} not approved: {error}")
+    return redirect('requestflow:admin_requests')
+
+
 class RequestDetailView(LoginRequiredMixin, UserPassesTestMixin, DetailView):
     model = IPRequest
     template_name = 'requestflow/request_detail.html'
     context_object_name = 'ip_request'
 
+    def get_object(self, queryset=None):
+        # test_func and get/post both need the request; fetch it once
+        if not hasattr(self, '_object'):
+            self._object = super().get_object(queryset)
+        return self._object
+
     def test_func(self):
         obj = self.get_object()
         # Only allow the creator of the request to view
@@ -224,18 +323,31 @@ class RequestDetailView(LoginRequiredMixin, UserPassesTestMixin, DetailView):
         messages.error(self.request, "You are not allowed to view that request.")
         return redirect('requestflow:my_requests')
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['assigned_ips'] = list(self.object.assigned_ips.order_by('ip_int'))
+        return context
+
     def post(self, request, *args, **kwargs):
         self.object = self.get_object()
 
-        updated = 0
-        for ip in self.object.assigned_ips.all():
+        # Diff the submitted comments in memory and write the changed rows
+        # with one UPDATE per batch instead of one per address.
+        now = timezone.now()
+        changed = []
+        for ip in self.object.assigned_ips.only('id', 'description'):
             field_name = f'desc_{ip.id}'
             if field_name in request.POST:
                 new_desc = request.POST.get(field_name, '').strip()
                 if new_desc != (ip.description or ''):
                     ip.description = new_desc
-                    ip.save(update_fields=['description', 'updated_at'])
-                    updated += 1
+                    # bulk_update skips auto_now, so stamp the change here
+                    ip.updated_at = now
+                    changed.append(ip)
+
+        with transaction.atomic():
+            AssignedIP.objects.bulk_update(changed, ['description', 'updated_at'], batch_size=BULK_BATCH_SIZE)
+        updated = len(changed)
 
         if updated:
             messages.success(request, f"Saved comments for {updated} IP(s).")
@@ -277,16 +389,12 @@ def pool_stats(request, pk):
     used_first = None
     used_last = None
     if used:
-        assigned_list = list(
-            AssignedIP.objects.filter(ip_request__selected_ippool=pool)
-            .values_list('ip_address', flat=True)
+        bounds = AssignedIP.objects.filter(pool=pool).aggregate(
+            first=Min('ip_int'), last=Max('ip_int'),
         )
-        try:
-            ip_objs = [ipaddress.IPv4Address(ip) for ip in assigned_list]
-            used_first = str(min(ip_objs))
-            used_last = str(max(ip_objs))
-        except Exception:
-            used_first, used_last = None, None
+        if bounds['first'] is not None:
+            used_first = int_to_ip(bounds['first'])
+            used_last = int_to_ip(bounds['last'])
 
     return JsonResponse({
         "pool_id": pool.id,
@@ -298,3 +406,90 @@ def pool_stats(request, pk):
         "used_first": used_first,
         "used_last": used_last,
     })
+
+
+def export_assignments(request):
+    """Stream assigned IPs as CSV or NDJSON.
+
+    Query parameters: ``format`` (``csv`` by default, or ``ndjson``) and the
+    optional filters ``pool`` (id), ``vlan`` (VLAN number), ``user`` (id or
+    email) and ``status``.
+    """
+    if not request.user.is_authenticated or not request.user.is_superuser:
+        return HttpResponseForbidden()
+
+    fmt = request.GET.get('format', FORMAT_CSV)
+    if fmt not in EXPORT_FORMATS:
+        return JsonResponse({"detail": f"Unknown format: {fmt}"}, status=400)
+    status = request.GET.get('status')
+    if status and status not in dict(IPRequest.STATUS_CHOICES):
+        return JsonResponse({"detail": f"Unknown status: {status}"}, status=400)
+    try:
+        queryset = export_queryset(
+            pool=request.GET.get('pool') and int(request.GET['pool']),
+            vlan=request.GET.get('vlan') and int(request.GET['vlan']),
+            user=request.GET.get('user'),
+            status=status,
+        )
+    except ValueError:
+        return JsonResponse(
+            {"detail": "pool and user must be ids (user may also be an email), vlan a VLAN number."}, status=400,
+        )
+
+    response = StreamingHttpResponse(iter_export(queryset, fmt), content_type=CONTENT_TYPES[fmt])
+    response['Content-Disposition'] = f'attachment; filename="assigned_ips.{fmt}"'
+    return response
+
+
+# Most addresses and networks accepted by one lookup call
+MAX_LOOKUP_TARGETS = 10000
+
+# Most assignments returned by one lookup call (large networks are cut here)
+MAX_LOOKUP_RESULTS = 50000
+
+
+def lookup_addresses(request):
+    """Return who holds the given IPv4 addresses and networks, as JSON.
+
+    Targets come from ``?q=`` (repeatable; comma or space separated), from a
+    JSON body ``{"addresses": [...]}`` or from a plain-text body with one
+    address or CIDR per line. Each result has the address, user, request,
+    pool, VLAN and expiry; ``unassigned`` lists the single addresses nobody
+    holds and ``errors`` the targets that could not be parsed. POSTs are
+    session authenticated, so they need the CSRF token like any form.
+    """
+    if not request.user.is_authenticated or not request.user.is_superuser:
+        return HttpResponseForbidden()
+
+    if request.method == 'POST':
+        if request.content_type == 'application/json':
+            try:
+                values = json.loads(request.body).get('addresses') or []
+            except (ValueError, AttributeError):
+                values = None
+            if not isinstance(values, list):
+                return JsonResponse({"detail": "Expected a JSON object with an addresses list."}, status=400)
+        else:
+            values = request.body.decode('utf-8', errors='replace').split()
+    else:
+        values = [value for q in request.GET.getlist('q') for value in q.replace(',', ' ').split()]
+    if len(values) > MAX_LOOKUP_TARGETS:
+        return JsonResponse({"detail": f"At most {MAX_LOOKUP_TARGETS} addresses per lookup."}, status=400)
+
+    addresses, networks, errors = parse_targets(values)
+    results = []
+    truncated = False
+    for owner in lookup_owners(addresses, networks):
+        if len(results) == MAX_LOOKUP_RESULTS:
+            truncated = True
+            break
+        results.append(owner)
+
+    # From the database rather than ``results``, which may be truncated
+    found = assigned_addresses(addresses)
+    return JsonResponse({
+        "results": results,
+        "unassigned": [int_to_ip(ip) for ip in addresses if ip not in found],
+        "errors": errors,
+        "truncated": truncated,
+    })